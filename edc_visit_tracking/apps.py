@@ -1,13 +1,13 @@
-import sys
+import logging
+
+from types import MappingProxyType
 from django.apps import apps as django_apps
 from django.apps import AppConfig as DjangoAppConfig
 from django.core.exceptions import ImproperlyConfigured
-from django.core.management.color import color_style
-from dateutil.relativedelta import relativedelta
-import arrow
+from django.db.models.signals import post_save, post_delete
 from django.conf import settings
 
-style = color_style()
+logger = logging.getLogger(__name__)
 
 ATTR = 0
 MODEL_LABEL = 1
@@ -34,20 +34,70 @@ class AppConfig(DjangoAppConfig):
         'subject_visit', 'edc_visit_tracking.subjectvisit')}
     reason_field = {}
 
+    # set to True to measure the save pipeline, see instrumentation
+    instrumentation_enabled = False
+
+    # resolved in ready(), see register_visit_models
+    _visit_model_classes = MappingProxyType({})
+    _visit_model_attrs = MappingProxyType({})
+
     def ready(self):
 
+        from .instrumentation import instrumentation
+        from .visit_order_registry import visit_order_registry
         from .signals import visit_tracking_check_in_progress_on_post_save
+        from .signals import (
+            visit_sequence_cache_on_post_save,
+            visit_sequence_cache_on_post_delete)
 
-        sys.stdout.write(f'Loading {self.verbose_name} ...\n')
+        logger.info(f'Loading {self.verbose_name} ...')
         if not self.visit_models:
-            sys.stdout.write(style.ERROR(
-                'Warning: Visit models not declared. At least one is required. '
-                'See AppConfig.visit_models\n'))
+            logger.warning(
+                'Visit models not declared. At least one is required. '
+                'See AppConfig.visit_models')
         else:
-            for options in self.visit_models.values():
-                sys.stdout.write(
-                    f' * {options[MODEL_LABEL]} uses model attr \'{options[ATTR]}\'\n')
-        sys.stdout.write(f' Done loading {self.verbose_name}.\n')
+            self.register_visit_models()
+            for app_label, options in self.visit_models.items():
+                logger.info(
+                    f' * {options[MODEL_LABEL]} uses model attr \'{options[ATTR]}\'')
+                visit_model_cls = self.visit_model_cls(app_label)
+                post_save.connect(
+                    visit_tracking_check_in_progress_on_post_save,
+                    sender=visit_model_cls, weak=False,
+                    dispatch_uid=('visit_tracking_check_in_progress_on_post_save_'
+                                  f'{options[MODEL_LABEL]}'))
+                post_save.connect(
+                    visit_sequence_cache_on_post_save,
+                    sender=visit_model_cls, weak=False,
+                    dispatch_uid=('visit_sequence_cache_on_post_save_'
+                                  f'{options[MODEL_LABEL]}'))
+                post_delete.connect(
+                    visit_sequence_cache_on_post_delete,
+                    sender=visit_model_cls, weak=False,
+                    dispatch_uid=('visit_sequence_cache_on_post_delete_'
+                                  f'{options[MODEL_LABEL]}'))
+        visit_order_registry.populate()
+        if self.instrumentation_enabled:
+            instrumentation.enable()
+        logger.info(f' Done loading {self.verbose_name}.')
+
+    def register_visit_models(self):
+        """Resolves the visit model class for each app_label and the
+        visit model attribute for each CRF model in those apps once,
+        raising on any invalid entry at startup.
+        """
+        from .model_mixins import CrfModelMixin
+
+        visit_model_classes = {}
+        visit_model_attrs = {}
+        for app_label in self.visit_models:
+            visit_model_classes[app_label] = self.visit_model_cls(app_label)
+            for model in django_apps.get_app_config(app_label).get_models():
+                if issubclass(model, CrfModelMixin):
+                    visit_model_attrs[model._meta.label_lower] = self.visit_model_attr(
+                        model._meta.label_lower)
+        self._visit_model_classes = MappingProxyType(visit_model_classes)
+        self._visit_model_attrs = MappingProxyType(visit_model_attrs)
 
     def visit_model(self, app_label):
         """Return the visit model for this app_label.
@@ -60,6 +110,10 @@ class AppConfig(DjangoAppConfig):
     def visit_model_cls(self, app_label):
         """Return the visit model for this app_label.
         """
+        try:
+            return self._visit_model_classes[app_label]
+        except KeyError:
+            pass
         try:
             visit_model = django_apps.get_model(
                 *self.visit_models[app_label][MODEL_LABEL].split('.'))
@@ -73,6 +127,10 @@ class AppConfig(DjangoAppConfig):
         """Return the attribute name for models that use the
         visit model for the given app_label.
         """
+        try:
+            return self._visit_model_attrs[label_lower]
+        except KeyError:
+            pass
         app_label, model_name = label_lower.split('.')
         try:
             visit_model_attr = self.visit_models[app_label][ATTR]
@@ -92,12 +150,12 @@ class AppConfig(DjangoAppConfig):
         return visit_model_attr
 
 
-if settings.APP_NAME == 'edc_visit_tracking':
+if getattr(settings, 'APP_NAME', None) == 'edc_visit_tracking':
 
     from edc_metadata.apps import AppConfig as BaseEdcMetadataAppConfig
     from edc_facility.apps import AppConfig as BaseEdcFacilityAppConfig
     from edc_protocol.apps import AppConfig as BaseEdcProtocolAppConfig
-    from dateutil.relativedelta import MO, TU, WE, TH, FR
+    from dateutil.relativedelta import relativedelta, MO, TU, WE, TH, FR
 
     class EdcMetadataAppConfig(BaseEdcMetadataAppConfig):
         reason_field = {'edc_visit_tracking.subjectvisit': 'reason'}
@@ -112,5 +170,9 @@ if settings.APP_NAME == 'edc_visit_tracking':
             Overrides BaseEdcProtocolAppConfig to update the
             close protocol date
         """
-        study_close_datetime = (
-            arrow.utcnow().ceil('hour') + relativedelta(years=1))
+
+        def ready(self):
+            import arrow
+            self.study_close_datetime = (
+                arrow.utcnow().ceil('hour') + relativedelta(years=1))
+            super().ready()
@@ -0,0 +1,80 @@
+import threading
+import weakref
+
+from functools import partial
+from django.db import transaction
+
+
+class ApptStatusUpdater:
+
+    """Collects the visits whose appointment status needs to change
+    and updates the appointments once the transaction commits.
+
+    On commit, the pending visits are read in one query and each
+    appointment is set to the status implied by its committed visit,
+    see VisitModelManager.update_appt_statuses. Reading the committed
+    visits means visits rolled back after being added are ignored.
+
+    One callback is registered per transaction and database alias.
+    Outside of a transaction the update runs immediately.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def pending(self, using):
+        try:
+            pending = self._local.pending
+        except AttributeError:
+            pending = self._local.pending = {}
+        return pending.setdefault(using, {})
+
+    def queued(self, using):
+        """Returns True if a flush is queued on the current transaction
+        of the alias.
+
+        Only a weak reference to the queued callback is kept. If the
+        transaction or savepoint that queued it is rolled back, Django
+        drops the callback and the reference dies.
+        """
+        try:
+            callback = self._local.queued.get(using)
+        except AttributeError:
+            return False
+        return (callback is not None and callback() is not None
+                and transaction.get_connection(using).in_atomic_block)
+
+    def add(self, visit, using=None):
+        """Adds the visit and, if not already done for the current
+        transaction, schedules an update on commit.
+        """
+        using = using or visit._state.db
+        pending = self.pending(using)
+        queue = not self.queued(using)
+        if queue:
+            # drop visits left pending by a rolled back transaction
+            pending.clear()
+        pending.setdefault(visit.__class__, set()).add(visit.pk)
+        if queue:
+            callback = partial(self.flush, using)
+            try:
+                queued = self._local.queued
+            except AttributeError:
+                queued = self._local.queued = {}
+            queued[using] = weakref.ref(callback)
+            transaction.on_commit(callback, using=using)
+
+    def flush(self, using):
+        try:
+            self._local.queued.pop(using, None)
+        except AttributeError:
+            pass
+        pending = self.pending(using)
+        while pending:
+            visit_model_cls, pks = pending.popitem()
+            visits = visit_model_cls._base_manager.using(using).filter(
+                pk__in=pks).only('appointment', 'reason', 'require_crfs')
+            visit_model_cls.objects.db_manager(using).update_appt_statuses(visits)
+
+
+appt_status_updater = ApptStatusUpdater()
@@ -0,0 +1,80 @@
+import hashlib
+
+from django.contrib.admin import AllValuesFieldListFilter
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimated_count(queryset):
+    """Returns the database's estimate of the number of rows in the
+    queryset's table or None.
+
+    Only unfiltered querysets are estimated and only on PostgreSQL
+    and MySQL.
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples FROM pg_class WHERE relname = %s'
+    elif connection.vendor == 'mysql':
+        sql = ('SELECT table_rows FROM information_schema.tables '
+               'WHERE table_schema = DATABASE() AND table_name = %s')
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+
+    """A paginator that uses the database's row estimate instead of
+    COUNT(*) for unfiltered changelists on large tables.
+    """
+
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        try:
+            estimate = estimated_count(self.object_list)
+        except AttributeError:
+            estimate = None
+        if estimate is not None and estimate > self.estimate_threshold:
+            return estimate
+        return super().count
+
+
+class CachedAllValuesFieldListFilter(AllValuesFieldListFilter):
+
+    """An AllValuesFieldListFilter that caches the distinct values
+    for `list_filter_cache_timeout` seconds of the ModelAdmin.
+
+    The cache key includes a digest of the SQL of the values query.
+    If ModelAdmin.get_queryset limits the rows per user or site, each
+    scope is cached separately. If the timeout is None, the values
+    are not cached.
+    """
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        timeout = getattr(model_admin, 'list_filter_cache_timeout', None)
+        if timeout:
+            lookup_choices = self.lookup_choices
+            try:
+                sql, sql_params = lookup_choices.query.sql_with_params()
+            except EmptyResultSet:
+                return
+            digest = hashlib.sha256(
+                f'{lookup_choices.db}{sql}{sql_params!r}'.encode()).hexdigest()
+            self.lookup_choices = cache.get_or_set(
+                'edc_visit_tracking.list_filter.'
+                f'{model_admin.model._meta.label_lower}.{field_path}.{digest}',
+                lambda: list(lookup_choices), timeout)
@@ -1,9 +1,9 @@
-import arrow
-
-from dateutil.relativedelta import relativedelta
+from datetime import timedelta, timezone
+from functools import lru_cache
 from django.apps import apps as django_apps
 from django.core.exceptions import ValidationError
 from edc_base.model_validators.date import datetime_not_future
+from edc_base.utils import get_utcnow
 from edc_protocol.validators import datetime_not_before_study_start
 
 
@@ -19,6 +19,25 @@ class CrfReportDateIsFuture(Exception):
     pass
 
 
+def utc_datetime(value):
+    """Returns a datetime or Arrow value as a datetime in UTC.
+
+    Naive values are assumed to be in UTC.
+    """
+    value = getattr(value, 'datetime', value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+@lru_cache(maxsize=None)
+def get_default_report_datetime_allowance():
+    """Returns AppConfig.report_datetime_allowance, read once.
+    """
+    app_config = django_apps.get_app_config('edc_visit_tracking')
+    return app_config.report_datetime_allowance
+
+
 class CrfDateValidator:
 
     report_datetime_allowance = None
@@ -32,12 +51,9 @@ class CrfDateValidator:
         self.report_datetime_allowance = (
             report_datetime_allowance or self.report_datetime_allowance)
         if not self.report_datetime_allowance:
-            app_config = django_apps.get_app_config('edc_visit_tracking')
-            self.report_datetime_allowance = app_config.report_datetime_allowance
-        self.report_datetime = arrow.Arrow.fromdatetime(
-            report_datetime, report_datetime.tzinfo).to('utc').datetime
-        self.visit_report_datetime = arrow.Arrow.fromdatetime(
-            visit_report_datetime, visit_report_datetime.tzinfo).to('utc').datetime
+            self.report_datetime_allowance = get_default_report_datetime_allowance()
+        self.report_datetime = utc_datetime(report_datetime)
+        self.visit_report_datetime = utc_datetime(visit_report_datetime)
         self.created = created
         self.modified = modified
         self.subject_identifier = subject_identifier
@@ -69,7 +85,7 @@ class CrfDateValidator:
         if self.report_datetime_allowance > 0:
             max_allowed_report_datetime = (
                 self.visit_report_datetime
-                + relativedelta(days=self.report_datetime_allowance))
+                + timedelta(days=self.report_datetime_allowance))
             if self.report_datetime.date() > max_allowed_report_datetime.date():
                 diff = (max_allowed_report_datetime.date()
                         - self.visit_report_datetime.date()).days
@@ -80,3 +96,45 @@ class CrfDateValidator:
                     f'visit.report_datetime={self.visit_report_datetime}. '
                     f'See also AppConfig.report_datetime_allowance.',
                     'report_datetime')
+
+    @classmethod
+    def validate_many(cls, datetimes, report_datetime_allowance=None,
+                      allow_report_datetime_before_visit=None):
+        """Validates a sequence of (report_datetime, visit_report_datetime)
+        pairs in one pass and returns a dictionary of
+        {exception class: [index, ...]} for the pairs that fail.
+
+        Each pair is reported under the first rule it fails, in the
+        same order as `validate`. The study start, current time and
+        allowance are read once for the whole sequence.
+        """
+        allow_report_datetime_before_visit = (
+            allow_report_datetime_before_visit
+            or cls.allow_report_datetime_before_visit)
+        report_datetime_allowance = (
+            report_datetime_allowance or cls.report_datetime_allowance)
+        if not report_datetime_allowance:
+            report_datetime_allowance = get_default_report_datetime_allowance()
+        study_open_datetime = utc_datetime(
+            django_apps.get_app_config('edc_protocol').study_open_datetime)
+        utcnow = get_utcnow()
+        violations = {}
+        for index, (report_datetime, visit_report_datetime) in enumerate(datetimes):
+            report_datetime = utc_datetime(report_datetime)
+            report_date = report_datetime.date().toordinal()
+            visit_report_date = utc_datetime(
+                visit_report_datetime).date().toordinal()
+            if report_datetime < study_open_datetime:
+                error_cls = CrfReportDateBeforeStudyStart
+            elif report_datetime > utcnow:
+                error_cls = CrfReportDateIsFuture
+            elif (not allow_report_datetime_before_visit
+                    and report_date < visit_report_date):
+                error_cls = CrfReportDateAllowanceError
+            elif (report_datetime_allowance > 0
+                    and report_date > visit_report_date + report_datetime_allowance):
+                error_cls = CrfReportDateAllowanceError
+            else:
+                continue
+            violations.setdefault(error_cls, []).append(index)
+        return violations
@@ -0,0 +1,121 @@
+import logging
+
+from contextlib import contextmanager, nullcontext
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.dispatch import Signal
+from time import perf_counter
+
+
+logger = logging.getLogger('edc_visit_tracking.instrumentation')
+
+# sent with phase, seconds, queries, instance and using for each
+# measured phase while instrumentation is enabled.
+phase_measured = Signal()
+
+PREVIOUS_VISIT_MODEL_SAVE = 'previous_visit_model.save'
+VISIT_MODEL_SAVE = 'visit_model.save'
+VISIT_MODEL_POST_SAVE = 'visit_model.post_save'
+CRF_MODEL_SAVE = 'crf_model.save'
+VISIT_SEQUENCE_PREVIOUS_VISIT = 'visit_sequence.previous_visit'
+
+_disabled = nullcontext()
+
+
+class Instrumentation:
+
+    """Measures the wall time and number of queries of the phases
+    of the visit and CRF save pipeline.
+
+    Disabled by default. While disabled, `measure` returns a shared
+    no-op context manager.
+
+    Each measurement is sent as `phase_measured` and passed to the
+    registered collectors. Phases nest, so the queries and time of
+    a phase include those of the phases it contains.
+
+    For example:
+
+        instrumentation.register(PhaseStatsCollector())
+        instrumentation.enable()
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.collectors = []
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def register(self, collector):
+        """Registers a callable that accepts the keyword arguments
+        phase, seconds, queries, instance and using.
+        """
+        if collector not in self.collectors:
+            self.collectors.append(collector)
+
+    def unregister(self, collector):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def measure(self, phase, instance=None, using=None):
+        if not self.enabled:
+            return _disabled
+        return self._measure(phase, instance=instance, using=using)
+
+    @contextmanager
+    def _measure(self, phase, instance=None, using=None):
+        using = using or DEFAULT_DB_ALIAS
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        start = perf_counter()
+        with connections[using].execute_wrapper(count_queries):
+            yield
+        self.collect(
+            phase=phase, seconds=perf_counter() - start,
+            queries=len(queries), instance=instance, using=using)
+
+    def collect(self, **measurement):
+        phase_measured.send(sender=self.__class__, **measurement)
+        for collector in self.collectors:
+            collector(**measurement)
+
+
+class PhaseStatsCollector:
+
+    """An in-process collector that keeps the count, total seconds
+    and total queries for each phase.
+    """
+
+    def __init__(self):
+        self.stats = {}
+
+    def __call__(self, phase=None, seconds=None, queries=None, **kwargs):
+        stats = self.stats.setdefault(
+            phase, dict(count=0, seconds=0.0, queries=0))
+        stats['count'] += 1
+        stats['seconds'] += seconds
+        stats['queries'] += queries
+
+    def reset(self):
+        self.stats = {}
+
+
+def log_collector(phase=None, seconds=None, queries=None, instance=None, **kwargs):
+    """A collector that writes each measurement to the
+    'edc_visit_tracking.instrumentation' logger.
+    """
+    logger.info(
+        f'{phase} took {seconds * 1000:.3f}ms and {queries} queries',
+        extra=dict(
+            phase=phase, seconds=seconds, queries=queries,
+            model=None if instance is None else instance._meta.label_lower))
+
+
+instrumentation = Instrumentation()
@@ -1,4 +1,17 @@
-from django.db import models
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import OuterRef, Subquery, prefetch_related_objects
+
+from .natural_key_cache import natural_key_cache
+from .visit_order_registry import visit_order_registry
+from .visit_sequence_cache import visit_sequence_cache
+
+VISIT_NATURAL_KEY_FIELDS = (
+    'subject_identifier', 'visit_schedule_name', 'schedule_name',
+    'visit_code', 'visit_code_sequence')
 
 
 class CrfModelManager(models.Manager):
@@ -8,10 +21,57 @@ class CrfModelManager(models.Manager):
 
     def get_by_natural_key(self, subject_identifier, visit_schedule_name,
                            schedule_name, visit_code, visit_code_sequence):
-        instance = self.model.visit_model().objects.get_by_natural_key(
-            subject_identifier, visit_schedule_name, schedule_name,
-            visit_code, visit_code_sequence)
-        return self.get(**{self.model.visit_model_attr(): instance})
+        instance = natural_key_cache.get_instance(
+            self.model, (subject_identifier, visit_schedule_name, schedule_name,
+                         visit_code, visit_code_sequence))
+        if instance:
+            return instance
+        visit_model_attr = self.model.visit_model_attr()
+        return self.get(**{
+            f'{visit_model_attr}__subject_identifier': subject_identifier,
+            f'{visit_model_attr}__visit_schedule_name': visit_schedule_name,
+            f'{visit_model_attr}__schedule_name': schedule_name,
+            f'{visit_model_attr}__visit_code': visit_code,
+            f'{visit_model_attr}__visit_code_sequence': visit_code_sequence})
+
+    def get_by_natural_keys(self, natural_keys):
+        """Returns a dictionary of {natural_key: instance} for the
+        given visit natural keys using one query.
+        """
+        natural_keys = set(tuple(natural_key) for natural_key in natural_keys)
+        if not natural_keys:
+            return {}
+        visit_model_attr = self.model.visit_model_attr()
+        queryset = self.filter(**{
+            f'{visit_model_attr}__subject_identifier__in': set(
+                natural_key[0] for natural_key in natural_keys),
+            f'{visit_model_attr}__visit_schedule_name__in': set(
+                natural_key[1] for natural_key in natural_keys),
+            f'{visit_model_attr}__schedule_name__in': set(
+                natural_key[2] for natural_key in natural_keys),
+            f'{visit_model_attr}__visit_code__in': set(
+                natural_key[3] for natural_key in natural_keys)}).select_related(
+                    visit_model_attr)
+        instances = {}
+        duplicates = set()
+        for instance in queryset:
+            natural_key = getattr(instance, visit_model_attr).natural_key()
+            if natural_key in natural_keys:
+                if natural_key in instances:
+                    duplicates.add(natural_key)
+                instances[natural_key] = instance
+        # leave out natural keys shared by more than one CRF so that
+        # get_by_natural_key raises MultipleObjectsReturned
+        for natural_key in duplicates:
+            del instances[natural_key]
+        return instances
+
+    def select_related_visit(self):
+        """Returns a queryset that joins the visit and its
+        appointment.
+        """
+        return self.select_related(
+            f'{self.model.visit_model_attr()}__appointment')
 
     def get_for_visit(self, visit, **kwargs):
         """Returns an instance for the given visit.
@@ -34,6 +94,79 @@ class CrfModelManager(models.Manager):
             self.model.visit_model_attr()): subject_identifier}
         return self.filter(**options)
 
+    def export_values(self, queryset=None, fields=None, chunk_size=2000):
+        """Yields a dictionary per CRF of its visit's natural key
+        followed by the CRF field values without building model
+        instances.
+
+        Rows are read with `iterator`, which uses a server-side
+        cursor where the database supports it. `fields` defaults to
+        the attnames of the CRF's concrete fields.
+        """
+        visit_model_attr = self.model.visit_model_attr()
+        queryset = self.all() if queryset is None else queryset
+        fields = list(fields or self.export_fields())
+        lookups = [f'{visit_model_attr}__{name}' for name in VISIT_NATURAL_KEY_FIELDS]
+        for row in queryset.values_list(*lookups, *fields).iterator(
+                chunk_size=chunk_size):
+            yield dict(zip(VISIT_NATURAL_KEY_FIELDS + tuple(fields), row))
+
+    def export_fields(self):
+        return [field.attname for field in self.model._meta.concrete_fields]
+
+    def export_to_csv(self, file, queryset=None, fields=None, chunk_size=2000):
+        """Writes `export_values` to an open file as CSV.
+        """
+        fields = list(fields or self.export_fields())
+        writer = csv.DictWriter(
+            file, fieldnames=list(VISIT_NATURAL_KEY_FIELDS) + fields)
+        writer.writeheader()
+        for row in self.export_values(
+                queryset=queryset, fields=fields, chunk_size=chunk_size):
+            writer.writerow(row)
+
+    def export_to_jsonl(self, file, queryset=None, fields=None, chunk_size=2000):
+        """Writes `export_values` to an open file as JSON Lines.
+        """
+        for row in self.export_values(
+                queryset=queryset, fields=fields, chunk_size=chunk_size):
+            file.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+
+class CrfInlineModelManager(models.Manager):
+    """A manager class for CRF inline models, models that have an FK
+    to a CRF model declared in Meta.crf_inline_parent.
+    """
+
+    def visit_lookup(self):
+        """Returns the lookup from the inline to the visit's
+        appointment, e.g. 'crf_one__subject_visit__appointment'.
+        """
+        crf_inline_parent = self.model._meta.crf_inline_parent
+        parent_model = self.model._meta.get_field(crf_inline_parent).related_model
+        return f'{crf_inline_parent}__{parent_model.visit_model_attr()}__appointment'
+
+    def select_related_visit(self):
+        """Returns a queryset that joins the inline parent, its visit
+        and the visit's appointment.
+        """
+        return self.select_related(self.visit_lookup())
+
+    def prefetch_related_visit(self):
+        """Returns a queryset that loads the inline parents, their
+        visits and appointments with one query each, sharing the
+        instances between inline rows of the same parent.
+        """
+        return self.prefetch_related(self.visit_lookup())
+
+    def prefetch_visits(self, objs):
+        """Loads the inline parents, their visits and appointments for
+        inline instances already in memory, for example those of a
+        formset, with one query each.
+        """
+        prefetch_related_objects(objs, self.visit_lookup())
+        return objs
+
 
 class VisitModelManager(models.Manager):
     """A manager class for visit models.
@@ -41,6 +174,11 @@ class VisitModelManager(models.Manager):
 
     def get_by_natural_key(self, subject_identifier, visit_schedule_name,
                            schedule_name, visit_code, visit_code_sequence):
+        instance = natural_key_cache.get_instance(
+            self.model, (subject_identifier, visit_schedule_name, schedule_name,
+                         visit_code, visit_code_sequence))
+        if instance:
+            return instance
         return self.get(
             subject_identifier=subject_identifier,
             visit_schedule_name=visit_schedule_name,
@@ -48,6 +186,27 @@ class VisitModelManager(models.Manager):
             visit_code=visit_code,
             visit_code_sequence=visit_code_sequence)
 
+    def get_by_natural_keys(self, natural_keys):
+        """Returns a dictionary of {natural_key: instance} for the
+        given natural keys using one query.
+        """
+        natural_keys = set(tuple(natural_key) for natural_key in natural_keys)
+        if not natural_keys:
+            return {}
+        queryset = self.filter(
+            subject_identifier__in=set(
+                natural_key[0] for natural_key in natural_keys),
+            visit_schedule_name__in=set(
+                natural_key[1] for natural_key in natural_keys),
+            schedule_name__in=set(natural_key[2] for natural_key in natural_keys),
+            visit_code__in=set(natural_key[3] for natural_key in natural_keys))
+        instances = {}
+        for instance in queryset:
+            natural_key = instance.natural_key()
+            if natural_key in natural_keys:
+                instances[natural_key] = instance
+        return instances
+
     def last_visit(self, subject_identifier=None, visit_schedule_names=None,
                    schedule_names=None):
         """Returns the last visit for a subject.
@@ -59,14 +218,181 @@ class VisitModelManager(models.Manager):
         Note: schedule names are in
         <visit_schedule_name>.<schedule_name> dot format
         """
+        options = self._last_visit_options(
+            visit_schedule_names=visit_schedule_names,
+            schedule_names=schedule_names)
+        if subject_identifier:
+            options.update(dict(subject_identifier=subject_identifier))
+        return self.filter(**options).order_by('-report_datetime').first()
+
+    def last_visits(self, subject_identifiers=None, visit_schedule_names=None,
+                    schedule_names=None):
+        """Returns a queryset of the last visit for each subject
+        using one query.
+
+        subject_identifiers may be a list or a queryset of values.
+        See also `last_visit`.
+        """
+        options = self._last_visit_options(
+            visit_schedule_names=visit_schedule_names,
+            schedule_names=schedule_names)
+        queryset = self.filter(**options)
+        if subject_identifiers is not None:
+            queryset = queryset.filter(subject_identifier__in=subject_identifiers)
+        last_visit = self.filter(
+            subject_identifier=OuterRef('subject_identifier'), **options).order_by(
+                '-report_datetime').values('pk')[:1]
+        return queryset.filter(pk=Subquery(last_visit))
+
+    def last_visit_summary(self, subject_identifiers=None, visit_schedule_names=None,
+                           schedule_names=None, chunk_size=2000):
+        """Yields a dictionary of subject_identifier, visit_code,
+        report_datetime, reason and require_crfs of the last visit
+        for each subject, ordered by subject_identifier, from one
+        query.
+
+        See also `last_visits`.
+        """
+        yield from self.last_visits(
+            subject_identifiers=subject_identifiers,
+            visit_schedule_names=visit_schedule_names,
+            schedule_names=schedule_names).order_by('subject_identifier').values(
+                'subject_identifier', 'visit_code', 'report_datetime',
+                'reason', 'require_crfs').iterator(chunk_size=chunk_size)
+
+    def _last_visit_options(self, visit_schedule_names=None, schedule_names=None):
         options = {}
         if schedule_names:
-            schedule_names = [name.split('.')[-1] for name in schedule_names]
             if not visit_schedule_names and '.' in schedule_names[0]:
                 visit_schedule_names = list(
                     set([name.split('.')[0] for name in schedule_names]))
-        if subject_identifier:
-            options.update(dict(subject_identifier=subject_identifier))
+            schedule_names = [name.split('.')[-1] for name in schedule_names]
+            options.update(dict(schedule_name__in=schedule_names))
         if visit_schedule_names:
             options.update(dict(visit_schedule_name__in=visit_schedule_names))
-        return self.filter(**options).order_by('report_datetime').last()
+        return options
+
+    def bulk_create_visits(self, objs, batch_size=None):
+        """Validates the visit sequence for and inserts a batch of
+        unsaved visit model instances, returning the instances.
+
+        Each instance must have its appointment set. The sequence is
+        checked over the batch together with the subjects' existing
+        visits, the visit schedule fields are copied from the
+        appointments, the instances are written with `bulk_create`
+        and the appointment statuses are updated with one UPDATE per
+        status.
+
+        Note: as with `bulk_create`, save() is not called, signals are
+        not sent and historical records are not written.
+        """
+        objs = list(objs)
+        if not objs:
+            return objs
+        self.model.check_appointment_on_delete()
+        self.fetch_appointments(objs)
+        for obj in objs:
+            obj.update_visit_schedule_fields()
+            obj.update_require_crfs()
+        self.check_sequence(objs)
+        with transaction.atomic(using=self.db):
+            objs = self.bulk_create(objs, batch_size=batch_size)
+            self.update_appt_statuses(objs)
+        for subject_identifier in set(obj.subject_identifier for obj in objs):
+            visit_sequence_cache.invalidate(subject_identifier=subject_identifier)
+        return objs
+
+    def fetch_appointments(self, objs):
+        """Sets the appointment on instances where it is not yet
+        loaded using one query.
+        """
+        objs = [obj for obj in objs if not self.model.appointment.is_cached(obj)]
+        if objs:
+            appointment_model_cls = self.model._meta.get_field(
+                'appointment').related_model
+            appointments = appointment_model_cls.objects.using(self.db).in_bulk(
+                [obj.appointment_id for obj in objs])
+            for obj in objs:
+                obj.appointment = appointments[obj.appointment_id]
+
+    def check_sequence(self, objs):
+        """Raises PreviousVisitError if the previous visit of any
+        instance is neither in the batch nor already saved.
+        """
+        from .model_mixins import PreviousVisitError
+
+        visit_codes = set(self.filter(
+            subject_identifier__in=set(obj.subject_identifier for obj in objs)
+        ).values_list(
+            'subject_identifier', 'visit_schedule_name',
+            'schedule_name', 'visit_code'))
+        visit_codes.update(
+            (obj.subject_identifier, obj.visit_schedule_name,
+             obj.schedule_name, obj.visit_code) for obj in objs)
+        for obj in objs:
+            previous_visit_code = visit_order_registry.previous_visit_code(
+                obj.visit_schedule_name, obj.schedule_name, obj.visit_code)
+            if previous_visit_code and (
+                    obj.subject_identifier, obj.visit_schedule_name,
+                    obj.schedule_name, previous_visit_code) not in visit_codes:
+                raise PreviousVisitError(
+                    'Previous visit report required. Enter report for '
+                    f'\'{previous_visit_code}\' before completing this report. '
+                    f'Got {obj.subject_identifier} {obj.visit_code}.')
+
+    def update_appt_statuses(self, objs):
+        """Updates the appointment status implied by each visit
+        with one UPDATE per status.
+
+        Appointments already loaded on the visits are updated in
+        memory as well.
+        """
+        appointment_model_cls = self.model._meta.get_field(
+            'appointment').related_model
+        appointment_pks = {}
+        for obj in objs:
+            appt_status = obj.get_appt_status()
+            if self.model.appointment.is_cached(obj):
+                obj.appointment.appt_status = appt_status
+            appointment_pks.setdefault(appt_status, []).append(obj.appointment_id)
+        for appt_status, pks in appointment_pks.items():
+            appointment_model_cls._base_manager.using(self.db).filter(
+                pk__in=pks).exclude(
+                    appt_status=appt_status).update(appt_status=appt_status)
+
+    def prefetch_appointment_zero(self, objs):
+        """Sets appointment_zero on saved visit instances using one
+        query and returns the instances.
+
+        Matches on the visit schedule fields copied onto each visit
+        on save.
+        """
+        objs = list(objs)
+        if objs:
+            appointment_model_cls = self.model._meta.get_field(
+                'appointment').related_model
+            appointments = {}
+            for appointment in appointment_model_cls.objects.using(self.db).filter(
+                    subject_identifier__in=set(obj.subject_identifier for obj in objs),
+                    visit_schedule_name__in=set(
+                        obj.visit_schedule_name for obj in objs),
+                    schedule_name__in=set(obj.schedule_name for obj in objs),
+                    visit_code__in=set(obj.visit_code for obj in objs),
+                    visit_code_sequence=0):
+                appointments[(appointment.subject_identifier,
+                              appointment.visit_schedule_name,
+                              appointment.schedule_name,
+                              appointment.visit_code)] = appointment
+            for obj in objs:
+                obj._appointment_zero = appointments.get(
+                    (obj.subject_identifier, obj.visit_schedule_name,
+                     obj.schedule_name, obj.visit_code))
+        return objs
+
+    def appointment_zeros(self, objs):
+        """Returns a dictionary of {visit pk: appointment zero or None}
+        for saved visit instances using one query.
+        """
+        return {
+            obj.pk: obj.appointment_zero
+            for obj in self.prefetch_appointment_zero(objs)}
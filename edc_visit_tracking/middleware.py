@@ -0,0 +1,19 @@
+from .visit_sequence_cache import visit_sequence_cache
+
+
+class VisitSequenceCacheMiddleware:
+
+    """Activates the visit sequence cache for each request so that
+    form validation, model save and CRF rules share previous visit
+    lookups.
+
+    Add 'edc_visit_tracking.middleware.VisitSequenceCacheMiddleware'
+    to settings.MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with visit_sequence_cache.enabled():
+            return self.get_response(request)
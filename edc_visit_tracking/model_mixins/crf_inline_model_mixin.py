@@ -2,7 +2,9 @@ from django.core.exceptions import ImproperlyConfigured
 from django.db import models
 from django.db.models import options
 from django.db.models.fields.related import OneToOneField, ForeignKey
+from django.db.models.signals import class_prepared
 
+from ..managers import CrfInlineModelManager
 from .model_mixins import ModelMixin
 
 
@@ -11,26 +13,25 @@ options.DEFAULT_NAMES = options.DEFAULT_NAMES + ('crf_inline_parent',)
 
 class CrfInlineModelMixin(ModelMixin, models.Model):
     """A mixin for models used as inlines in ModelAdmin.
+
+    The inline parent model attribute name is read from
+    Meta.crf_inline_parent or, if not declared, detected once per
+    class from its only foreign key, see `crf_inline_parent_on_class_prepared`.
     """
 
+    objects = CrfInlineModelManager()
+
     def __init__(self, *args, **kwargs):
-        """Try to detect the inline parent model attribute
-        name or raise.
+        """Raise if the inline parent model attribute name
+        could not be determined for this class.
         """
         super().__init__(*args, **kwargs)
-        try:
-            self._meta.crf_inline_parent
-        except AttributeError:
-            fks = [field for field in self._meta.fields if isinstance(
-                field, (OneToOneField, ForeignKey))]
-            if len(fks) == 1:
-                self.__class__._meta.crf_inline_parent = fks[0].name
-            else:
-                raise ImproperlyConfigured(
-                    'CrfInlineModelMixin cannot determine the '
-                    'inline parent model name. Got more than one foreign key. '
-                    'Try declaring \"crf_inline_parent = \'<field name>\'\" '
-                    'explicitly in Meta.')
+        if not self._meta.crf_inline_parent:
+            raise ImproperlyConfigured(
+                'CrfInlineModelMixin cannot determine the '
+                'inline parent model name. Got more than one foreign key. '
+                'Try declaring \"crf_inline_parent = \'<field name>\'\" '
+                'explicitly in Meta.')
 
     def __str__(self):
         return str(self.parent_instance.visit)
@@ -48,11 +49,7 @@ class CrfInlineModelMixin(ModelMixin, models.Model):
     def parent_model(self):
         """Return the class of the inline parent model.
         """
-        field = getattr(self.__class__, self._meta.crf_inline_parent).field
-        try:
-            return field.rel.to
-        except AttributeError:
-            return field.remote_field.model  # django 2.0 +
+        return self._meta.get_field(self._meta.crf_inline_parent).related_model
 
     @property
     def visit(self):
@@ -72,3 +69,20 @@ class CrfInlineModelMixin(ModelMixin, models.Model):
     class Meta:
         crf_inline_parent = None
         abstract = True
+
+
+def crf_inline_parent_on_class_prepared(sender, **kwargs):
+    """Sets Meta.crf_inline_parent on each CRF inline model class
+    that does not declare it to the name of its only foreign key,
+    otherwise to None.
+    """
+    if issubclass(sender, CrfInlineModelMixin):
+        if not getattr(sender._meta, 'crf_inline_parent', None):
+            fks = [field for field in sender._meta.fields if isinstance(
+                field, (OneToOneField, ForeignKey))]
+            sender._meta.crf_inline_parent = fks[0].name if len(fks) == 1 else None
+
+
+class_prepared.connect(
+    crf_inline_parent_on_class_prepared,
+    weak=False, dispatch_uid='crf_inline_parent_on_class_prepared')
@@ -6,6 +6,7 @@ from edc_protocol.validators import datetime_not_before_study_start
 from edc_visit_tracking.managers import CrfModelManager
 
 from ..crf_date_validator import CrfDateValidator
+from ..instrumentation import instrumentation, CRF_MODEL_SAVE
 from .model_mixins import ModelMixin
 
 
@@ -36,13 +37,15 @@ class CrfModelMixin(ModelMixin, models.Model):
         return str(self.visit)
 
     def save(self, *args, **kwargs):
-        if self.crf_date_validator_cls:
-            self.crf_date_validator_cls(
-                report_datetime=self.report_datetime,
-                visit_report_datetime=self.visit.report_datetime,
-                created=self.created,
-                modified=self.modified)
-        super().save(*args, **kwargs)
+        with instrumentation.measure(
+                CRF_MODEL_SAVE, instance=self, using=kwargs.get('using')):
+            if self.crf_date_validator_cls:
+                self.crf_date_validator_cls(
+                    report_datetime=self.report_datetime,
+                    visit_report_datetime=self.visit.report_datetime,
+                    created=self.created,
+                    modified=self.modified)
+            super().save(*args, **kwargs)
 
     def natural_key(self):
         return (getattr(self, self.visit_model_attr()).natural_key(), )
@@ -56,7 +59,7 @@ class CrfModelMixin(ModelMixin, models.Model):
     @classmethod
     def visit_model(cls):
         app_config = django_apps.get_app_config('edc_visit_tracking')
-        return app_config.visit_model(cls._meta.app_label)
+        return app_config.visit_model_cls(cls._meta.app_label)
 
     @property
     def visit(self):
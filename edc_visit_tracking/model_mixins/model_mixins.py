@@ -7,7 +7,7 @@ class ModelMixin(models.Model):
     @classmethod
     def visit_model(cls):
         app_config = django_apps.get_app_config('edc_visit_tracking')
-        return app_config.visit_model(cls._meta.app_label)
+        return app_config.visit_model_cls(cls._meta.app_label)
 
     @property
     def visit_code(self):
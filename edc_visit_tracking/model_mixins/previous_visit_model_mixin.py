@@ -1,5 +1,6 @@
 from django.db import models
 
+from ..instrumentation import instrumentation, PREVIOUS_VISIT_MODEL_SAVE
 from ..visit_sequence import VisitSequence, VisitSequenceError
 
 
@@ -23,12 +24,14 @@ class PreviousVisitModelMixin(models.Model):
             appointment = self.visit.appointment
         except AttributeError:
             appointment = self.appointment
-        visit_sequence = self.visit_sequence_cls(
-            appointment=appointment)
-        try:
-            visit_sequence.enforce_sequence()
-        except VisitSequenceError as e:
-            raise PreviousVisitError(e)
+        with instrumentation.measure(
+                PREVIOUS_VISIT_MODEL_SAVE, instance=self, using=kwargs.get('using')):
+            visit_sequence = self.visit_sequence_cls(
+                appointment=appointment)
+            try:
+                visit_sequence.enforce_sequence()
+            except VisitSequenceError as e:
+                raise PreviousVisitError(e)
         super().save(*args, **kwargs)
 
     @property
@@ -9,10 +9,12 @@ from edc_constants.constants import YES, NO
 from edc_identifier.model_mixins import NonUniqueSubjectIdentifierFieldMixin
 from edc_visit_schedule.model_mixins import VisitScheduleModelMixin
 
+from ...appt_status_updater import appt_status_updater
 from ...choices import VISIT_REASON
 from ...constants import FOLLOW_UP_REASONS, REQUIRED_REASONS, NO_FOLLOW_UP_REASONS
 from ...constants import LOST_VISIT, COMPLETED_PROTOCOL_VISIT
 from ...constants import MISSED_VISIT, SCHEDULED, UNSCHEDULED
+from ...instrumentation import instrumentation, VISIT_MODEL_SAVE
 from ...managers import VisitModelManager
 from ..previous_visit_model_mixin import PreviousVisitModelMixin
 from .visit_model_fields_mixin import VisitModelFieldsMixin
@@ -44,24 +46,36 @@ class VisitModelMixin(
         return f'{self.subject_identifier} {self.visit_code}.{self.visit_code_sequence}'
 
     def save(self, *args, **kwargs):
-        if self.__class__.appointment.field.remote_field.on_delete != PROTECT:
+        with instrumentation.measure(
+                VISIT_MODEL_SAVE, instance=self, using=kwargs.get('using')):
+            self.check_appointment_on_delete()
+            self.update_visit_schedule_fields()
+            self.update_require_crfs()
+            super().save(*args, **kwargs)
+
+    @classmethod
+    def check_appointment_on_delete(cls):
+        if cls.appointment.field.remote_field.on_delete != PROTECT:
             raise ImproperlyConfigured(
                 'OneToOne relation to appointment must set '
                 'on_delete=PROTECT. Got {}'.format(
-                    self.__class__.appointment.field.remote_field.on_delete.__name__))
+                    cls.appointment.field.remote_field.on_delete.__name__))
+
+    def update_visit_schedule_fields(self):
+        """Copies the visit schedule fields from the appointment.
+        """
         self.subject_identifier = self.appointment.subject_identifier
         self.visit_schedule_name = self.appointment.visit_schedule_name
         self.schedule_name = self.appointment.schedule_name
         self.visit_code = self.appointment.visit_code
         self.visit_code_sequence = self.appointment.visit_code_sequence
 
+    def update_require_crfs(self):
         if self.reason in [MISSED_VISIT, LOST_VISIT, FAILED_ELIGIBILITY]:
             self.require_crfs = NO
         elif self.reason in [UNSCHEDULED, SCHEDULED, COMPLETED_PROTOCOL_VISIT]:
             self.require_crfs = YES
 
-        super().save(*args, **kwargs)
-
     def natural_key(self):
         return (self.subject_identifier,
                 self.visit_schedule_name,
@@ -74,19 +88,26 @@ class VisitModelMixin(
 
     @property
     def appointment_zero(self):
-        appointment_zero = None
+        """Returns the appointment with visit_code_sequence 0 for
+        this visit's schedule and visit code or None.
+
+        The result is kept on the instance. See also
+        VisitModelManager.prefetch_appointment_zero.
+        """
         try:
-            if self.appointment.visit_code_sequence == 0:
-                appointment_zero = self.appointment
+            return self._appointment_zero
         except AttributeError:
             pass
-        if not appointment_zero:
-            try:
-                appointment_zero = self.appointment.__class__.objects.get(
-                    subject_identifier=self.appointment.subject_identifier,
-                    visit_code_sequence=0)
-            except self.appointment.__class__.DoesNotExist:
-                pass
+        if self.appointment.visit_code_sequence == 0:
+            appointment_zero = self.appointment
+        else:
+            appointment_zero = self.appointment.__class__.objects.filter(
+                subject_identifier=self.appointment.subject_identifier,
+                visit_schedule_name=self.appointment.visit_schedule_name,
+                schedule_name=self.appointment.schedule_name,
+                visit_code=self.appointment.visit_code,
+                visit_code_sequence=0).first()
+        self._appointment_zero = appointment_zero
         return appointment_zero
 
     def get_visit_reason_no_follow_up_choices(self):
@@ -133,16 +154,22 @@ class VisitModelMixin(
                         missing_keys,
                         REQUIRED_REASONS))
 
-    def post_save_check_appointment_in_progress(self):
+    def get_appt_status(self):
+        """Returns the appointment status implied by this visit.
+        """
         if (self.reason in self.get_visit_reason_no_follow_up_choices()
                 or self.require_crfs != YES):
-            if self.appointment.appt_status != COMPLETE_APPT:
-                self.appointment.appt_status = COMPLETE_APPT
-                self.appointment.save()
-        else:
-            if self.appointment.appt_status != IN_PROGRESS_APPT:
-                self.appointment.appt_status = IN_PROGRESS_APPT
-                self.appointment.save()
+            return COMPLETE_APPT
+        return IN_PROGRESS_APPT
+
+    def post_save_check_appointment_in_progress(self):
+        """Updates the appointment status once the transaction
+        commits, see ApptStatusUpdater.
+        """
+        appt_status = self.get_appt_status()
+        if self.appointment.appt_status != appt_status:
+            self.appointment.appt_status = appt_status
+            appt_status_updater.add(self)
 
     class Meta:
         abstract = True
@@ -152,6 +179,10 @@ class VisitModelMixin(
             ('subject_identifier', 'visit_schedule_name',
              'schedule_name', 'report_datetime'),
         )
+        # the second unique_together above also indexes
+        # (subject_identifier, visit_schedule_name, schedule_name, report_datetime)
+        indexes = [
+            models.Index(fields=['subject_identifier', 'report_datetime'])]
         ordering = (('subject_identifier', 'visit_schedule_name',
                      'schedule_name', 'visit_code', 'visit_code_sequence',
                      'report_datetime',))
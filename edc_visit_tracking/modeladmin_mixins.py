@@ -9,6 +9,29 @@ from edc_visit_schedule.fieldsets import (
     visit_schedule_fieldset_tuple,
     visit_schedule_fields)
 
+from .changelist import CachedAllValuesFieldListFilter, EstimatedCountPaginator
+
+
+class OptimizedChangeListAdminMixin:
+
+    """ModelAdmin mixin for changelists of large CRF and visit
+    tables.
+
+    Caches the distinct values of the list filters of
+    CrfModelAdminMixin and VisitModelAdminMixin for
+    `list_filter_cache_timeout` seconds, uses the database's row
+    estimate for unfiltered changelists and skips the full result
+    count. For example:
+
+        class SubjectVisitAdmin(OptimizedChangeListAdminMixin,
+                                VisitModelAdminMixin, admin.ModelAdmin):
+            pass
+    """
+
+    list_filter_cache_timeout = 300
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
 
 class CrfModelAdminMixin:
 
@@ -34,10 +57,17 @@ class CrfModelAdminMixin:
     def visit_model_attr(self):
         return self.model.visit_model_attr()
 
+    def get_queryset(self, request):
+        """Returns the queryset joined on the visit and its
+        appointment for the changelist columns and __str__.
+        """
+        return super().get_queryset(request).select_related(
+            f'{self.visit_model_attr}__appointment')
+
     def extend_search_fields(self):
         self.search_fields = list(self.search_fields)
         self.search_fields.extend([
-            '{}__appointment__subject_identifier'.format(
+            '{}__subject_identifier'.format(
                 self.visit_model_attr)])
         self.search_fields = tuple(set(self.search_fields))
 
@@ -50,7 +80,8 @@ class CrfModelAdminMixin:
             self.visit_model_attr + '__report_datetime',
             self.visit_model_attr + '__reason',
             self.visit_model_attr + '__appointment__appt_status',
-            self.visit_model_attr + '__appointment__visit_code'])
+            (self.visit_model_attr + '__visit_code',
+             CachedAllValuesFieldListFilter)])
         self.list_filter = tuple(self.list_filter)
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
@@ -106,23 +137,28 @@ class VisitModelAdminMixin:
                     'modified', 'user_created',
                     'user_modified', ]
 
-    search_fields = ['id', 'reason', 'appointment__visit_code',
-                     'appointment__subject_identifier']
+    search_fields = ['id', 'reason', 'visit_code', 'subject_identifier']
 
     list_filter = [
         'report_datetime',
-        'appointment__visit_code',
-        'appointment__visit_code_sequence',
+        ('visit_code', CachedAllValuesFieldListFilter),
+        ('visit_code_sequence', CachedAllValuesFieldListFilter),
         'reason',
         'require_crfs',
         'created',
         'modified',
-        'user_created',
-        'user_modified',
-        'hostname_created']
+        ('user_created', CachedAllValuesFieldListFilter),
+        ('user_modified', CachedAllValuesFieldListFilter),
+        ('hostname_created', CachedAllValuesFieldListFilter)]
 
     def subject_identifier(self, obj=None):
-        return obj.appointment.subject_identifier
+        return obj.subject_identifier
+
+    def get_queryset(self, request):
+        """Returns the queryset joined on the appointment for the
+        changelist columns.
+        """
+        return super().get_queryset(request).select_related('appointment')
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'appointment':
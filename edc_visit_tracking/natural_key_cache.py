@@ -0,0 +1,29 @@
+from .thread_local_cache import ThreadLocalCache
+
+
+class NaturalKeyCache(ThreadLocalCache):
+
+    """A cache of model instances by natural key consulted by
+    `get_by_natural_key` on the visit and CRF model managers.
+
+    Entries are keyed on (model_cls, natural_key). For CRF models
+    the natural key is that of the CRF's visit.
+
+    The cache does nothing until activated, see `enabled`. It is
+    filled in bulk, for example by the deserializers in
+    `edc_visit_tracking.serializers`.
+    """
+
+    def get_instance(self, model_cls, natural_key):
+        return self.get((model_cls, tuple(natural_key)))
+
+    def update(self, model_cls, instances):
+        """Adds instances from a dictionary of
+        {natural_key: instance}.
+        """
+        if self.active:
+            self.store.update(
+                {(model_cls, tuple(k)): v for k, v in instances.items()})
+
+
+natural_key_cache = NaturalKeyCache()
@@ -0,0 +1 @@
+from .prefetch_natural_keys import prefetch_natural_keys
@@ -0,0 +1,23 @@
+import json
+
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.json import Serializer  # noqa
+
+from .python import Deserializer as PythonDeserializer
+
+
+def Deserializer(stream_or_string, **options):
+    """Deserializes a stream or string of JSON data, see
+    edc_visit_tracking.serializers.python.Deserializer.
+    """
+    if not isinstance(stream_or_string, (bytes, str)):
+        stream_or_string = stream_or_string.read()
+    if isinstance(stream_or_string, bytes):
+        stream_or_string = stream_or_string.decode()
+    try:
+        objects = json.loads(stream_or_string)
+        yield from PythonDeserializer(objects, **options)
+    except (GeneratorExit, DeserializationError):
+        raise
+    except Exception as exc:
+        raise DeserializationError() from exc
@@ -0,0 +1,38 @@
+from django.apps import apps as django_apps
+from django.db import DEFAULT_DB_ALIAS
+
+from ..managers import VISIT_NATURAL_KEY_FIELDS
+from ..model_mixins import CrfModelMixin, VisitModelMixin
+from ..natural_key_cache import natural_key_cache
+
+
+def prefetch_natural_keys(object_list, using=None):
+    """Loads the visit model instances referred to by natural key
+    in a list of serialized python objects into the natural key cache
+    with one query per visit model.
+
+    CRFs are not prefetched. A CRF natural key wraps the natural
+    key of its visit, so Django cannot pass it to get_by_natural_key.
+    """
+    natural_keys = {}
+    for obj in object_list:
+        try:
+            model = django_apps.get_model(obj['model'])
+        except (LookupError, TypeError, ValueError, KeyError):
+            continue
+        fields = obj.get('fields', {})
+        if issubclass(model, VisitModelMixin):
+            natural_key = tuple(fields.get(name) for name in VISIT_NATURAL_KEY_FIELDS)
+            natural_keys.setdefault(model, set()).add(natural_key)
+        elif issubclass(model, CrfModelMixin):
+            visit_model_attr = model.visit_model_attr()
+            natural_key = fields.get(visit_model_attr)
+            if isinstance(natural_key, (list, tuple)):
+                visit_model_cls = model._meta.get_field(
+                    visit_model_attr).related_model
+                natural_keys.setdefault(visit_model_cls, set()).add(
+                    tuple(natural_key))
+    for model, keys in natural_keys.items():
+        natural_key_cache.update(
+            model, model._default_manager.db_manager(
+                using or DEFAULT_DB_ALIAS).get_by_natural_keys(keys))
@@ -0,0 +1,30 @@
+from itertools import islice
+
+from django.core.serializers import python
+from django.core.serializers.python import Serializer  # noqa
+from django.db import DEFAULT_DB_ALIAS
+
+from ..natural_key_cache import natural_key_cache
+from .prefetch_natural_keys import prefetch_natural_keys
+
+CHUNK_SIZE = 1000
+
+
+def Deserializer(object_list, *, using=DEFAULT_DB_ALIAS, chunk_size=None, **options):
+    """Deserializes a list of python objects in chunks, loading the
+    visit and CRF instances referred to by natural key for each
+    chunk in one query per model.
+
+    The natural key cache only holds the instances of the current
+    chunk.
+    """
+    object_list = iter(object_list)
+    chunk_size = chunk_size or CHUNK_SIZE
+    with natural_key_cache.enabled():
+        while True:
+            chunk = list(islice(object_list, chunk_size))
+            if not chunk:
+                break
+            natural_key_cache.clear()
+            prefetch_natural_keys(chunk, using=using)
+            yield from python.Deserializer(chunk, using=using, **options)
@@ -1,16 +1,32 @@
-from django.db.models.signals import post_save
-from django.dispatch import receiver
+from .instrumentation import instrumentation, VISIT_MODEL_POST_SAVE
+from .visit_sequence_cache import visit_sequence_cache
 
 
-@receiver(post_save, weak=False,
-          dispatch_uid="visit_tracking_check_in_progress_on_post_save")
 def visit_tracking_check_in_progress_on_post_save(
         sender, instance, raw, created, using, **kwargs):
     """Calls post_save method on the visit tracking instance.
+
+    Connected to each visit model in AppConfig.ready().
     """
     if not raw:
-        try:
+        with instrumentation.measure(
+                VISIT_MODEL_POST_SAVE, instance=instance, using=using):
             instance.post_save_check_appointment_in_progress()
-        except AttributeError as e:
-            if 'post_save_check_appointment_in_progress' not in str(e):
-                raise
+
+
+def visit_sequence_cache_on_post_save(sender, instance, raw, created, using, **kwargs):
+    """Drops cached previous visit lookups for the subject.
+
+    Connected to each visit model in AppConfig.ready().
+    """
+    visit_sequence_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
+
+
+def visit_sequence_cache_on_post_delete(sender, instance, using, **kwargs):
+    """Drops cached previous visit lookups for the subject.
+
+    Connected to each visit model in AppConfig.ready().
+    """
+    visit_sequence_cache.invalidate(
+        subject_identifier=instance.subject_identifier)
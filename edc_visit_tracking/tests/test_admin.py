@@ -0,0 +1,113 @@
+from dateutil.relativedelta import relativedelta
+from django.contrib.admin import AdminSite, ModelAdmin
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory
+from edc_appointment.models import Appointment
+from edc_base import get_utcnow
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from ..changelist import CachedAllValuesFieldListFilter, EstimatedCountPaginator
+from ..changelist import estimated_count
+from ..constants import SCHEDULED
+from ..modeladmin_mixins import CrfModelAdminMixin, VisitModelAdminMixin
+from ..modeladmin_mixins import OptimizedChangeListAdminMixin
+from .helper import Helper
+from .models import SubjectVisit, CrfOne
+from .visit_schedule import visit_schedule1, visit_schedule2
+
+
+class SubjectVisitAdmin(OptimizedChangeListAdminMixin, VisitModelAdminMixin,
+                        ModelAdmin):
+    pass
+
+
+class ScopedSubjectVisitAdmin(SubjectVisitAdmin):
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).filter(
+            visit_code=request.GET.get('scope'))
+
+
+class CrfOneAdmin(OptimizedChangeListAdminMixin, CrfModelAdminMixin, ModelAdmin):
+    pass
+
+
+class TestAdmin(TestCase):
+
+    helper_cls = Helper
+
+    def setUp(self):
+        import_holidays()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.subject_identifier = '12345'
+        self.helper = self.helper_cls(
+            subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        for index, appointment in enumerate(appointments[0:2]):
+            subject_visit = SubjectVisit.objects.create(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            CrfOne.objects.create(
+                subject_visit=subject_visit,
+                report_datetime=subject_visit.report_datetime)
+        self.site = AdminSite()
+        self.request = RequestFactory().get('/')
+
+    def test_list_filter_choices_cached(self):
+        model_admin = SubjectVisitAdmin(SubjectVisit, self.site)
+        field = SubjectVisit._meta.get_field('visit_code')
+        list_filter = CachedAllValuesFieldListFilter(
+            field, self.request, {}, SubjectVisit, model_admin, 'visit_code')
+        self.assertEqual(list(list_filter.lookup_choices), ['1000', '2000'])
+        with self.assertNumQueries(0):
+            list_filter = CachedAllValuesFieldListFilter(
+                field, self.request, {}, SubjectVisit, model_admin, 'visit_code')
+        self.assertEqual(list(list_filter.lookup_choices), ['1000', '2000'])
+
+    def test_list_filter_choices_cached_per_queryset_scope(self):
+        model_admin = ScopedSubjectVisitAdmin(SubjectVisit, self.site)
+        field = SubjectVisit._meta.get_field('visit_code')
+        for scope in ['1000', '2000']:
+            with self.subTest(scope=scope):
+                request = RequestFactory().get('/', {'scope': scope})
+                list_filter = CachedAllValuesFieldListFilter(
+                    field, request, {}, SubjectVisit, model_admin, 'visit_code')
+                self.assertEqual(list(list_filter.lookup_choices), [scope])
+
+    def test_list_filter_choices_not_cached_without_timeout(self):
+        model_admin = SubjectVisitAdmin(SubjectVisit, self.site)
+        model_admin.list_filter_cache_timeout = None
+        field = SubjectVisit._meta.get_field('visit_code')
+        CachedAllValuesFieldListFilter(
+            field, self.request, {}, SubjectVisit, model_admin, 'visit_code')
+        with self.assertNumQueries(1):
+            list_filter = CachedAllValuesFieldListFilter(
+                field, self.request, {}, SubjectVisit, model_admin, 'visit_code')
+            self.assertEqual(list(list_filter.lookup_choices), ['1000', '2000'])
+
+    def test_crf_list_filter_uses_visit_code_on_visit(self):
+        model_admin = CrfOneAdmin(CrfOne, self.site)
+        self.assertIn(
+            ('subject_visit__visit_code', CachedAllValuesFieldListFilter),
+            model_admin.list_filter)
+
+    def test_visit_queryset_selects_appointment(self):
+        model_admin = SubjectVisitAdmin(SubjectVisit, self.site)
+        queryset = model_admin.get_queryset(self.request)
+        with self.assertNumQueries(1):
+            for obj in queryset:
+                str(obj.appointment)
+                model_admin.subject_identifier(obj)
+
+    def test_paginator_counts_when_no_estimate(self):
+        queryset = SubjectVisit.objects.all()
+        if estimated_count(queryset) is None:
+            self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 2)
+        self.assertIsNone(estimated_count(queryset.filter(visit_code='1000')))
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase, tag
+
+
+class TestApps(SimpleTestCase):
+
+    """Imports edc_visit_tracking.apps in a fresh interpreter
+    with `-X importtime` as a project other than this one would.
+    """
+
+    heavy_modules = [
+        'arrow', 'edc_metadata', 'edc_facility', 'edc_protocol',
+        'edc_appointment', 'edc_visit_schedule']
+
+    def import_times(self):
+        """Returns a dictionary of {module: cumulative microseconds}.
+        """
+        env = {k: v for k, v in os.environ.items() if k != 'DJANGO_SETTINGS_MODULE'}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c',
+             'from django.conf import settings; settings.configure(); '
+             'import edc_visit_tracking.apps'],
+            cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+        self.assertEqual(result.returncode, 0, msg=result.stderr)
+        import_times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith('import time:') and '|' in line:
+                _, cumulative, module = line.split('|')
+                try:
+                    import_times[module.strip()] = int(cumulative)
+                except ValueError:
+                    pass
+        return import_times
+
+    def test_apps_module_does_not_import_heavy_modules(self):
+        import_times = self.import_times()
+        self.assertIn('edc_visit_tracking.apps', import_times)
+        self.assertEqual(
+            [m for m in import_times if m.split('.')[0] in self.heavy_modules], [])
+
+    @tag('benchmark')
+    def test_apps_module_import_time(self):
+        import_times = self.import_times()
+        sys.stdout.write(
+            '\nedc_visit_tracking.apps imported in '
+            f'{import_times["edc_visit_tracking.apps"] / 1000:.1f}ms\n')
@@ -0,0 +1,198 @@
+import os
+import sys
+import warnings
+
+from contextlib import contextmanager
+from dateutil.relativedelta import relativedelta
+from django.core import serializers
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from edc_appointment.models import Appointment
+from edc_base import get_utcnow
+from edc_constants.constants import ALIVE, YES, PARTICIPANT
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+from time import perf_counter
+
+from ..constants import SCHEDULED
+from ..form_validators import VisitFormValidator
+from ..instrumentation import instrumentation, PhaseStatsCollector
+from ..instrumentation import VISIT_MODEL_POST_SAVE
+from ..serializers import json as edc_json
+from ..serializers.python import CHUNK_SIZE
+from ..visit_sequence import VisitSequence
+from .helper import Helper
+from .models import SubjectVisit, CrfOne, OtherModel
+from .visit_schedule import visit_schedule1, visit_schedule2
+
+
+class Benchmark:
+
+    """Collects the number of queries, savepoints and wall time
+    of each measured operation.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.queries = []
+        self.savepoints = []
+        self.seconds = 0.0
+
+    @contextmanager
+    def measure(self):
+        with CaptureQueriesContext(connection) as context:
+            start = perf_counter()
+            yield
+            self.seconds += perf_counter() - start
+        self.queries.append(len(context.captured_queries))
+        self.savepoints.append(len([
+            query for query in context.captured_queries
+            if query['sql'].upper().startswith('SAVEPOINT')]))
+
+    def __str__(self):
+        operations = len(self.queries)
+        return (f'{self.name:<22} operations={operations:<7} '
+                f'queries/op={max(self.queries)!s:<4} '
+                f'savepoints/op={max(self.savepoints)!s:<3} '
+                f'total={self.seconds:.3f}s '
+                f'per op={1000 * self.seconds / operations:.3f}ms')
+
+
+@tag('benchmark')
+class TestBenchmarks(TestCase):
+
+    """Reports query counts and wall time of the visit tracking
+    workflows and fails if the queries per operation exceed the
+    budget or vary with the subject.
+
+    Set EDC_VISIT_TRACKING_BENCHMARK_SUBJECTS to a comma separated
+    list of subject counts, e.g. 10,100,1000,100000. Defaults to 10.
+
+        python manage.py test edc_visit_tracking.tests.test_benchmarks
+    """
+
+    helper_cls = Helper
+
+    # operations that only read and must not open a savepoint
+    read_only = ['visit_form_clean', 'previous_visit']
+
+    # maximum number of queries per operation. Queries inside a
+    # TestCase include savepoints. Visit saves include the appointment
+    # status update run on commit.
+    query_budgets = dict(
+        visit_save=6,
+        visit_save_with_previous=7,
+        non_visit_model_save=1,
+        visit_form_clean=1,
+        previous_visit=1,
+        crf_save=2)
+
+    def setUp(self):
+        import_holidays()
+        self.helper = self.helper_cls()
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+
+    @property
+    def subject_counts(self):
+        return [int(count) for count in os.environ.get(
+            'EDC_VISIT_TRACKING_BENCHMARK_SUBJECTS', '10').split(',')]
+
+    def test_benchmarks(self):
+        for subject_count in self.subject_counts:
+            with self.subTest(subject_count=subject_count):
+                benchmarks = self.run_benchmarks(subject_count)
+                sys.stdout.write(f'\nBenchmarks for {subject_count} subjects\n')
+                for benchmark in benchmarks.values():
+                    sys.stdout.write(f'  {benchmark}\n')
+                for name, budget in self.query_budgets.items():
+                    queries = benchmarks[name].queries
+                    self.assertEqual(
+                        min(queries), max(queries),
+                        msg=f'{name} queries vary by subject. Got {set(queries)}.')
+                    self.assertLessEqual(
+                        max(queries), budget,
+                        msg=f'{name} exceeds its query budget.')
+                for name in self.read_only:
+                    self.assertEqual(
+                        max(benchmarks[name].savepoints), 0,
+                        msg=f'{name} opens a savepoint.')
+                chunks = -(-subject_count // CHUNK_SIZE)
+                self.assertLessEqual(
+                    max(benchmarks['natural_key_load'].queries), chunks)
+
+    def test_non_visit_model_save_receivers(self):
+        """Asserts saving a non-visit model does not run the visit
+        model post_save receiver.
+        """
+        collector = PhaseStatsCollector()
+        instrumentation.register(collector)
+        instrumentation.enable()
+        self.addCleanup(instrumentation.unregister, collector)
+        self.addCleanup(instrumentation.disable)
+        OtherModel.objects.create()
+        self.assertNotIn(VISIT_MODEL_POST_SAVE, collector.stats)
+
+    def run_benchmarks(self, subject_count):
+        benchmarks = {
+            name: Benchmark(name=name) for name in [
+                'visit_save', 'visit_save_with_previous', 'non_visit_model_save',
+                'visit_form_clean', 'previous_visit', 'crf_save',
+                'natural_key_load']}
+        report_datetime = get_utcnow() - relativedelta(months=10)
+        prefix = f'{subject_count}-'
+        for index in range(0, subject_count):
+            subject_identifier = f'{prefix}{index}'
+            self.helper.consent_and_put_on_schedule(
+                subject_identifier=subject_identifier)
+            appointments = list(Appointment.objects.filter(
+                subject_identifier=subject_identifier).order_by(
+                    'timepoint_datetime'))
+            subject_visit = SubjectVisit(
+                appointment=appointments[0],
+                report_datetime=report_datetime,
+                reason=SCHEDULED)
+            with benchmarks['visit_save'].measure():
+                with self.captureOnCommitCallbacks(execute=True):
+                    subject_visit.save()
+            other_model = OtherModel()
+            with benchmarks['non_visit_model_save'].measure():
+                other_model.save()
+            form_validator = VisitFormValidator(cleaned_data=dict(
+                appointment=appointments[1],
+                reason=SCHEDULED,
+                is_present=YES,
+                survival_status=ALIVE,
+                info_source=PARTICIPANT,
+                last_alive_date=report_datetime.date()))
+            with benchmarks['visit_form_clean'].measure():
+                form_validator.validate()
+            with benchmarks['previous_visit'].measure():
+                VisitSequence(appointment=appointments[1]).previous_visit
+            next_subject_visit = SubjectVisit(
+                appointment=appointments[1],
+                report_datetime=report_datetime + relativedelta(days=1),
+                reason=SCHEDULED)
+            with benchmarks['visit_save_with_previous'].measure():
+                with self.captureOnCommitCallbacks(execute=True):
+                    next_subject_visit.save()
+            crf_one = CrfOne(
+                subject_visit=subject_visit,
+                report_datetime=report_datetime)
+            with benchmarks['crf_save'].measure():
+                crf_one.save()
+        data = serializers.serialize(
+            'json', CrfOne.objects.filter(
+                subject_visit__subject_identifier__startswith=prefix),
+            use_natural_foreign_keys=True)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with benchmarks['natural_key_load'].measure():
+                objects = list(edc_json.Deserializer(data))
+        self.assertEqual(len(objects), subject_count)
+        self.assertEqual(
+            [str(w.message) for w in caught
+             if issubclass(w.category, DeprecationWarning)], [])
+        return benchmarks
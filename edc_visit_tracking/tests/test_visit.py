@@ -1,14 +1,23 @@
+import warnings
+
 from dateutil.relativedelta import relativedelta
+from django.apps import apps as django_apps
 from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, transaction
 from django.test import TestCase, tag
+from edc_appointment.constants import IN_PROGRESS_APPT, COMPLETE_APPT
 from edc_appointment.models import Appointment
 from edc_base import get_utcnow
 from edc_facility.import_holidays import import_holidays
 from edc_visit_schedule.site_visit_schedules import site_visit_schedules
-from edc_visit_tracking.constants import SCHEDULED
+from edc_visit_tracking.constants import SCHEDULED, MISSED_VISIT
 
+from ..instrumentation import instrumentation, PhaseStatsCollector
+from ..instrumentation import (
+    PREVIOUS_VISIT_MODEL_SAVE, VISIT_MODEL_SAVE, VISIT_MODEL_POST_SAVE,
+    CRF_MODEL_SAVE, VISIT_SEQUENCE_PREVIOUS_VISIT)
 from .models import SubjectVisit, CrfOneInline, OtherModel
-from .models import CrfOne, BadCrfOneInline
+from .models import CrfOne, BadCrfOneInline, BadCrfOneInline2
 from .helper import Helper
 from .visit_schedule import visit_schedule1, visit_schedule2
 
@@ -108,3 +117,192 @@ class TestVisit(TestCase):
         self.assertEqual(subject_visit.previous_visit.pk, subject_visits[1].pk)
         subject_visit = subject_visits[3]
         self.assertEqual(subject_visit.previous_visit.pk, subject_visits[2].pk)
+
+    def test_appt_status_updated_on_commit(self):
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        with self.captureOnCommitCallbacks(execute=True):
+            SubjectVisit.objects.create(
+                appointment=appointments[0],
+                report_datetime=get_utcnow() - relativedelta(months=10),
+                reason=SCHEDULED)
+            SubjectVisit.objects.create(
+                appointment=appointments[1],
+                report_datetime=get_utcnow() - relativedelta(months=9),
+                reason=MISSED_VISIT)
+        self.assertEqual(
+            Appointment.objects.get(pk=appointments[0].pk).appt_status,
+            IN_PROGRESS_APPT)
+        self.assertEqual(
+            Appointment.objects.get(pk=appointments[1].pk).appt_status,
+            COMPLETE_APPT)
+
+    def test_appt_status_updates_coalesced(self):
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        with self.captureOnCommitCallbacks() as callbacks:
+            for index, appointment in enumerate(appointments):
+                SubjectVisit.objects.create(
+                    appointment=appointment,
+                    report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                    reason=SCHEDULED)
+        self.assertEqual(len(callbacks), 1)
+        # select visits, one update for all appointments
+        with self.assertNumQueries(2):
+            for callback in callbacks:
+                callback()
+        self.assertEqual(
+            Appointment.objects.filter(appt_status=IN_PROGRESS_APPT).count(), 4)
+
+    def test_appt_status_update_queued_again_after_rollback(self):
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    SubjectVisit.objects.create(
+                        appointment=appointments[0],
+                        report_datetime=get_utcnow() - relativedelta(months=10),
+                        reason=SCHEDULED)
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            SubjectVisit.objects.create(
+                appointment=appointments[0],
+                report_datetime=get_utcnow() - relativedelta(months=10),
+                reason=SCHEDULED)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(
+            Appointment.objects.get(pk=appointments[0].pk).appt_status,
+            IN_PROGRESS_APPT)
+
+    def test_post_save_receiver_connected_to_visit_models_only(self):
+        collector = PhaseStatsCollector()
+        instrumentation.register(collector)
+        instrumentation.enable()
+        self.addCleanup(instrumentation.unregister, collector)
+        self.addCleanup(instrumentation.disable)
+        self.helper.consent_and_put_on_schedule()
+        appointment = Appointment.objects.all().order_by('timepoint_datetime')[0]
+        subject_visit = SubjectVisit.objects.create(
+            appointment=appointment,
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        self.assertEqual(collector.stats[VISIT_MODEL_POST_SAVE]['count'], 1)
+        crf_one = CrfOne.objects.create(
+            subject_visit=subject_visit,
+            report_datetime=subject_visit.report_datetime)
+        other_model = OtherModel.objects.create()
+        CrfOneInline.objects.create(crf_one=crf_one, other_model=other_model)
+        self.assertEqual(collector.stats[VISIT_MODEL_POST_SAVE]['count'], 1)
+
+    def test_visit_models_registered_on_ready(self):
+        app_config = django_apps.get_app_config('edc_visit_tracking')
+        self.assertEqual(
+            app_config._visit_model_classes, {'edc_visit_tracking': SubjectVisit})
+        self.assertEqual(
+            app_config._visit_model_attrs.get('edc_visit_tracking.crfone'),
+            'subject_visit')
+        self.assertRaises(
+            TypeError, app_config._visit_model_attrs.__setitem__,
+            'edc_visit_tracking.crfone', 'blah')
+
+    def test_crf_visit_model_without_deprecation_warning(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', DeprecationWarning)
+            self.assertEqual(CrfOne.visit_model(), SubjectVisit)
+            self.assertEqual(CrfOneInline.visit_model(), SubjectVisit)
+
+    def test_crf_select_related_visit(self):
+        self.helper.consent_and_put_on_schedule()
+        appointment = Appointment.objects.all().order_by(
+            'timepoint_datetime')[0]
+        subject_visit = SubjectVisit.objects.create(
+            appointment=appointment, reason=SCHEDULED)
+        crf_one = CrfOne.objects.create(subject_visit=subject_visit)
+        other_model = OtherModel.objects.create()
+        for _ in range(0, 3):
+            CrfOneInline.objects.create(crf_one=crf_one, other_model=other_model)
+        with self.assertNumQueries(1):
+            for obj in CrfOne.objects.select_related_visit():
+                str(obj)
+                obj.subject_visit.appointment.appt_status
+        with self.assertNumQueries(1):
+            for obj in CrfOneInline.objects.select_related_visit():
+                str(obj)
+                obj.visit.appointment.appt_status
+
+    def test_crf_inline_parent_resolved_per_class(self):
+        self.assertEqual(CrfOneInline._meta.crf_inline_parent, 'crf_one')
+        self.assertIsNone(BadCrfOneInline._meta.crf_inline_parent)
+        self.assertIsNone(BadCrfOneInline2._meta.crf_inline_parent)
+        self.assertRaises(ImproperlyConfigured, BadCrfOneInline2)
+        self.assertEqual(CrfOneInline().parent_model, CrfOne)
+
+    def test_crf_inline_prefetch_visits(self):
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        other_model = OtherModel.objects.create()
+        for index, appointment in enumerate(appointments[0:2]):
+            subject_visit = SubjectVisit.objects.create(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            crf_one = CrfOne.objects.create(
+                subject_visit=subject_visit,
+                report_datetime=subject_visit.report_datetime)
+            for _ in range(0, 3):
+                CrfOneInline.objects.create(
+                    crf_one=crf_one, other_model=other_model)
+        # inlines, parents, visits, appointments
+        with self.assertNumQueries(4):
+            for obj in CrfOneInline.objects.prefetch_related_visit():
+                str(obj)
+                obj.natural_key()
+                obj.report_datetime
+                obj.visit.appointment.appt_status
+        objs = list(CrfOneInline.objects.all())
+        with self.assertNumQueries(3):
+            CrfOneInline.objects.prefetch_visits(objs)
+        with self.assertNumQueries(0):
+            for obj in objs:
+                str(obj)
+                obj.report_datetime
+
+    def test_instrumentation_disabled_by_default(self):
+        collector = PhaseStatsCollector()
+        instrumentation.register(collector)
+        self.addCleanup(instrumentation.unregister, collector)
+        self.helper.consent_and_put_on_schedule()
+        appointment = Appointment.objects.all().order_by('timepoint_datetime')[0]
+        SubjectVisit.objects.create(
+            appointment=appointment,
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        self.assertFalse(instrumentation.enabled)
+        self.assertEqual(collector.stats, {})
+
+    def test_instrumentation_measures_phases(self):
+        collector = PhaseStatsCollector()
+        instrumentation.register(collector)
+        instrumentation.enable()
+        self.addCleanup(instrumentation.unregister, collector)
+        self.addCleanup(instrumentation.disable)
+        self.helper.consent_and_put_on_schedule()
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        for index, appointment in enumerate(appointments[0:2]):
+            subject_visit = SubjectVisit.objects.create(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+        CrfOne.objects.create(
+            subject_visit=subject_visit,
+            report_datetime=subject_visit.report_datetime)
+        self.assertEqual(collector.stats[VISIT_MODEL_SAVE]['count'], 2)
+        self.assertEqual(collector.stats[PREVIOUS_VISIT_MODEL_SAVE]['count'], 2)
+        self.assertEqual(collector.stats[VISIT_MODEL_POST_SAVE]['count'], 2)
+        self.assertEqual(collector.stats[CRF_MODEL_SAVE]['count'], 1)
+        self.assertEqual(
+            collector.stats[VISIT_SEQUENCE_PREVIOUS_VISIT],
+            dict(count=1, seconds=collector.stats[
+                VISIT_SEQUENCE_PREVIOUS_VISIT]['seconds'], queries=1))
@@ -1,10 +1,18 @@
+from datetime import timezone
+from unittest import mock
+
+import arrow
+
 from dateutil.relativedelta import relativedelta
-from django.test import TestCase, tag
+from django.apps import apps as django_apps
+from django.test import TestCase
 from edc_base import get_utcnow
 
+from .. import crf_date_validator
 from ..crf_date_validator import CrfDateValidator
 from ..crf_date_validator import CrfReportDateAllowanceError
 from ..crf_date_validator import CrfReportDateIsFuture
+from ..crf_date_validator import CrfReportDateBeforeStudyStart
 
 
 class TestVisitDateValidator(TestCase):
@@ -51,3 +59,76 @@ class TestVisitDateValidator(TestCase):
             MyCrfDateValidator,
             report_datetime=visit_report_datetime + relativedelta(days=4),
             visit_report_datetime=visit_report_datetime)
+
+    def test_validate_many(self):
+        class MyCrfDateValidator(CrfDateValidator):
+            report_datetime_allowance = 3
+        visit_report_datetime = get_utcnow() - relativedelta(days=10)
+        datetimes = [
+            (visit_report_datetime, visit_report_datetime),
+            (visit_report_datetime - relativedelta(days=1), visit_report_datetime),
+            (visit_report_datetime + relativedelta(days=4), visit_report_datetime),
+            (get_utcnow() + relativedelta(years=10), visit_report_datetime),
+            (visit_report_datetime - relativedelta(years=10), visit_report_datetime),
+            (visit_report_datetime + relativedelta(days=2), visit_report_datetime)]
+        violations = MyCrfDateValidator.validate_many(datetimes)
+        self.assertEqual(violations, {
+            CrfReportDateAllowanceError: [1, 2],
+            CrfReportDateIsFuture: [3],
+            CrfReportDateBeforeStudyStart: [4]})
+
+    def test_validate_many_matches_validator(self):
+        utcnow = get_utcnow()
+        study_open_datetime = django_apps.get_app_config(
+            'edc_protocol').study_open_datetime
+        visit_report_datetime = utcnow - relativedelta(days=40)
+        datetimes = [
+            (visit_report_datetime + relativedelta(days=days), visit_report_datetime)
+            for days in range(-2, 40)]
+        datetimes.extend([
+            (utcnow + relativedelta(minutes=1), visit_report_datetime),
+            (utcnow + relativedelta(years=10), utcnow),
+            (study_open_datetime, study_open_datetime),
+            (study_open_datetime - relativedelta(seconds=1), study_open_datetime),
+            (study_open_datetime - relativedelta(days=1),
+             study_open_datetime - relativedelta(days=1)),
+            (visit_report_datetime - relativedelta(years=10), visit_report_datetime)])
+        error_classes = (
+            CrfReportDateAllowanceError, CrfReportDateBeforeStudyStart,
+            CrfReportDateIsFuture)
+        violations = CrfDateValidator.validate_many(datetimes)
+        for index, (report_datetime, visit_report_datetime) in enumerate(datetimes):
+            with self.subTest(index=index, report_datetime=report_datetime):
+                try:
+                    CrfDateValidator(
+                        report_datetime=report_datetime,
+                        visit_report_datetime=visit_report_datetime)
+                except error_classes as e:
+                    expected_cls = e.__class__
+                else:
+                    expected_cls = None
+                for error_cls in error_classes:
+                    self.assertEqual(
+                        index in violations.get(error_cls, []),
+                        error_cls is expected_cls,
+                        msg=f'{error_cls.__name__}')
+
+    def test_converts_to_utc(self):
+        dt = arrow.Arrow.fromdatetime(get_utcnow()).to('Africa/Gaborone').datetime
+        validator = CrfDateValidator(report_datetime=dt, visit_report_datetime=dt)
+        self.assertEqual(validator.report_datetime.tzinfo, timezone.utc)
+        self.assertEqual(validator.report_datetime, dt)
+
+    def test_per_call_avoids_arrow_and_app_registry(self):
+        """Guards the per-call cost of the validator used on every
+        CRF save and CRF form clean.
+        """
+        dt = get_utcnow() - relativedelta(days=1)
+        CrfDateValidator(report_datetime=dt, visit_report_datetime=dt)
+        self.assertNotIn('arrow', vars(crf_date_validator))
+        with mock.patch.object(crf_date_validator, 'django_apps') as apps:
+            apps.get_app_config.side_effect = AssertionError(
+                'get_app_config unexpectedly called')
+            for _ in range(0, 10):
+                CrfDateValidator(report_datetime=dt, visit_report_datetime=dt)
+        apps.get_app_config.assert_not_called()
@@ -0,0 +1,306 @@
+import csv
+import json
+
+from dateutil.relativedelta import relativedelta
+from io import StringIO
+from django.core import serializers
+from django.test import TestCase
+from edc_appointment.constants import IN_PROGRESS_APPT
+from edc_appointment.models import Appointment
+from edc_base import get_utcnow
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from ..constants import SCHEDULED, UNSCHEDULED
+from ..model_mixins import PreviousVisitError
+from ..natural_key_cache import natural_key_cache
+from ..serializers import json as edc_json
+from .helper import Helper
+from .models import SubjectVisit, CrfOne
+from .visit_schedule import visit_schedule1, visit_schedule2
+
+
+class TestVisitManager(TestCase):
+
+    helper_cls = Helper
+
+    def setUp(self):
+        import_holidays()
+        self.subject_identifier = '12345'
+        self.helper = self.helper_cls(
+            subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+
+    def test_bulk_create_visits(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        objs = [
+            SubjectVisit(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            for index, appointment in enumerate(appointments)]
+        SubjectVisit.objects.bulk_create_visits(objs)
+        self.assertEqual(SubjectVisit.objects.all().count(), 4)
+        for subject_visit in SubjectVisit.objects.all():
+            self.assertEqual(
+                subject_visit.subject_identifier, self.subject_identifier)
+            self.assertEqual(
+                subject_visit.visit_code, subject_visit.appointment.visit_code)
+            self.assertEqual(
+                subject_visit.appointment.appt_status, IN_PROGRESS_APPT)
+
+    def test_bulk_create_visits_number_of_queries(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        objs = [
+            SubjectVisit(
+                appointment_id=appointment.pk,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            for index, appointment in enumerate(appointments)]
+        # appointments, existing visits, savepoint, insert, update, release
+        with self.assertNumQueries(6):
+            SubjectVisit.objects.bulk_create_visits(objs)
+
+    def test_bulk_create_visits_enforces_sequence(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        objs = [
+            SubjectVisit(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            for index, appointment in enumerate(appointments) if index != 1]
+        self.assertRaises(
+            PreviousVisitError,
+            SubjectVisit.objects.bulk_create_visits, objs)
+        self.assertEqual(SubjectVisit.objects.all().count(), 0)
+
+    def add_visits_and_crfs(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        for index, appointment in enumerate(appointments):
+            subject_visit = SubjectVisit.objects.create(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+            CrfOne.objects.create(
+                subject_visit=subject_visit,
+                report_datetime=subject_visit.report_datetime)
+
+    def test_get_by_natural_keys(self):
+        self.add_visits_and_crfs()
+        natural_keys = [obj.natural_key() for obj in SubjectVisit.objects.all()]
+        with self.assertNumQueries(1):
+            subject_visits = SubjectVisit.objects.get_by_natural_keys(natural_keys)
+        self.assertEqual(len(subject_visits), 4)
+        with self.assertNumQueries(1):
+            crfs = CrfOne.objects.get_by_natural_keys(natural_keys)
+        self.assertEqual(len(crfs), 4)
+        for natural_key, crf_one in crfs.items():
+            self.assertEqual(crf_one.subject_visit.natural_key(), natural_key)
+
+    def test_get_by_natural_key_from_cache(self):
+        self.add_visits_and_crfs()
+        natural_keys = [obj.natural_key() for obj in SubjectVisit.objects.all()]
+        with natural_key_cache.enabled():
+            natural_key_cache.update(
+                CrfOne, CrfOne.objects.get_by_natural_keys(natural_keys))
+            with self.assertNumQueries(0):
+                for natural_key in natural_keys:
+                    crf_one = CrfOne.objects.get_by_natural_key(*natural_key)
+                    self.assertEqual(
+                        crf_one.subject_visit.natural_key(), natural_key)
+        with self.assertNumQueries(1):
+            CrfOne.objects.get_by_natural_key(*natural_keys[0])
+
+    def test_deserializer_prefetches_natural_keys(self):
+        self.add_visits_and_crfs()
+        data = serializers.serialize(
+            'json', CrfOne.objects.all(), use_natural_foreign_keys=True)
+        # one query for the visits
+        with self.assertNumQueries(1):
+            objects = list(edc_json.Deserializer(data))
+        self.assertEqual(len(objects), 4)
+        for obj in objects:
+            self.assertEqual(
+                obj.object.subject_visit_id,
+                CrfOne.objects.get(pk=obj.object.pk).subject_visit_id)
+
+    def test_get_by_natural_keys_leaves_out_shared_visits(self):
+        self.add_visits_and_crfs()
+        subject_visit = SubjectVisit.objects.get(visit_code='1000')
+        CrfOne.objects.create(
+            subject_visit=subject_visit,
+            report_datetime=subject_visit.report_datetime)
+        natural_keys = [obj.natural_key() for obj in SubjectVisit.objects.all()]
+        crfs = CrfOne.objects.get_by_natural_keys(natural_keys)
+        self.assertEqual(len(crfs), 3)
+        self.assertNotIn(subject_visit.natural_key(), crfs)
+        with natural_key_cache.enabled():
+            natural_key_cache.update(CrfOne, crfs)
+            self.assertRaises(
+                CrfOne.MultipleObjectsReturned,
+                CrfOne.objects.get_by_natural_key, *subject_visit.natural_key())
+
+    def test_deserializer_caches_one_chunk(self):
+        self.add_visits_and_crfs()
+        data = serializers.serialize(
+            'json', CrfOne.objects.all(), use_natural_foreign_keys=True)
+        # visits for each of two chunks
+        with self.assertNumQueries(2):
+            for obj in edc_json.Deserializer(data, chunk_size=2):
+                # the two visits of the chunk
+                self.assertLessEqual(len(natural_key_cache.store), 2)
+
+    def add_visits(self, subject_identifier, count):
+        appointments = Appointment.objects.filter(
+            subject_identifier=subject_identifier).order_by('timepoint_datetime')
+        for index, appointment in enumerate(appointments[:count]):
+            SubjectVisit.objects.create(
+                appointment=appointment,
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+
+    def test_last_visit(self):
+        self.add_visits(self.subject_identifier, 3)
+        subject_visit = SubjectVisit.objects.last_visit(
+            subject_identifier=self.subject_identifier)
+        self.assertEqual(subject_visit.visit_code, '3000')
+        subject_visit = SubjectVisit.objects.last_visit(
+            subject_identifier=self.subject_identifier,
+            schedule_names=['visit_schedule1.schedule1'])
+        self.assertEqual(subject_visit.visit_code, '3000')
+        self.assertIsNone(SubjectVisit.objects.last_visit(
+            subject_identifier=self.subject_identifier,
+            schedule_names=['visit_schedule2.schedule2']))
+
+    def test_appointment_zero(self):
+        self.add_visits(self.subject_identifier, 3)
+        subject_visit = SubjectVisit.objects.get(visit_code='2000')
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                subject_visit.appointment_zero.pk, subject_visit.appointment_id)
+        with self.assertNumQueries(0):
+            subject_visit.appointment_zero
+
+    def test_prefetch_appointment_zero(self):
+        self.add_visits(self.subject_identifier, 3)
+        subject_visits = list(SubjectVisit.objects.all())
+        with self.assertNumQueries(1):
+            SubjectVisit.objects.prefetch_appointment_zero(subject_visits)
+        with self.assertNumQueries(0):
+            for subject_visit in subject_visits:
+                self.assertEqual(
+                    subject_visit.appointment_zero.pk, subject_visit.appointment_id)
+        # visits, appointments
+        with self.assertNumQueries(2):
+            appointment_zeros = SubjectVisit.objects.appointment_zeros(
+                SubjectVisit.objects.all())
+        self.assertEqual(
+            {pk: appointment.pk for pk, appointment in appointment_zeros.items()},
+            {obj.pk: obj.appointment_id for obj in subject_visits})
+
+    def add_unscheduled_visit(self):
+        """Puts the subject on both schedules and returns an unscheduled
+        visit and the scheduled appointment of the same visit code.
+        """
+        _, schedule = site_visit_schedules.get_by_onschedule_model(
+            'edc_visit_tracking.onscheduletwo')
+        schedule.put_on_schedule(
+            subject_identifier=self.subject_identifier,
+            onschedule_datetime=get_utcnow())
+        appointment = Appointment.objects.get(
+            subject_identifier=self.subject_identifier,
+            visit_schedule_name='visit_schedule1',
+            schedule_name='schedule1',
+            visit_code='1000',
+            visit_code_sequence=0)
+        SubjectVisit.objects.create(
+            appointment=appointment,
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        unscheduled_appointment = Appointment.objects.get(pk=appointment.pk)
+        unscheduled_appointment.id = None
+        unscheduled_appointment.visit_code_sequence = 1
+        unscheduled_appointment.save()
+        subject_visit = SubjectVisit.objects.create(
+            appointment=unscheduled_appointment,
+            report_datetime=get_utcnow() - relativedelta(months=10, days=-1),
+            reason=UNSCHEDULED)
+        return subject_visit, appointment
+
+    def test_appointment_zero_of_unscheduled_visit(self):
+        subject_visit, appointment = self.add_unscheduled_visit()
+        subject_visit = SubjectVisit.objects.get(pk=subject_visit.pk)
+        self.assertEqual(subject_visit.appointment.visit_code_sequence, 1)
+        self.assertEqual(subject_visit.appointment_zero.pk, appointment.pk)
+
+    def test_prefetch_appointment_zero_of_unscheduled_visit(self):
+        subject_visit, appointment = self.add_unscheduled_visit()
+        subject_visits = list(SubjectVisit.objects.all())
+        with self.assertNumQueries(1):
+            SubjectVisit.objects.prefetch_appointment_zero(subject_visits)
+        with self.assertNumQueries(0):
+            for obj in subject_visits:
+                self.assertEqual(obj.appointment_zero.pk, appointment.pk)
+        self.assertEqual(len(subject_visits), 2)
+
+    def test_last_visits(self):
+        self.helper.consent_and_put_on_schedule(subject_identifier='54321')
+        self.add_visits(self.subject_identifier, 3)
+        self.add_visits('54321', 2)
+        with self.assertNumQueries(1):
+            last_visits = {
+                obj.subject_identifier: obj.visit_code
+                for obj in SubjectVisit.objects.last_visits()}
+        self.assertEqual(
+            last_visits, {self.subject_identifier: '3000', '54321': '2000'})
+        last_visits = SubjectVisit.objects.last_visits(
+            subject_identifiers=['54321'])
+        self.assertEqual([obj.visit_code for obj in last_visits], ['2000'])
+
+    def test_last_visit_summary(self):
+        self.helper.consent_and_put_on_schedule(subject_identifier='54321')
+        self.add_visits(self.subject_identifier, 3)
+        self.add_visits('54321', 2)
+        with self.assertNumQueries(1):
+            summary = list(SubjectVisit.objects.last_visit_summary(
+                subject_identifiers=SubjectVisit.objects.values(
+                    'subject_identifier')))
+        self.assertEqual(
+            [(row['subject_identifier'], row['visit_code'], row['reason'])
+             for row in summary],
+            [(self.subject_identifier, '3000', SCHEDULED),
+             ('54321', '2000', SCHEDULED)])
+        self.assertEqual(
+            set(summary[0]),
+            {'subject_identifier', 'visit_code', 'report_datetime',
+             'reason', 'require_crfs'})
+
+    def test_crf_export_values(self):
+        self.add_visits_and_crfs()
+        with self.assertNumQueries(1):
+            rows = list(CrfOne.objects.export_values(fields=['id', 'f1']))
+        self.assertEqual(len(rows), 4)
+        for row in rows:
+            crf_one = CrfOne.objects.get(pk=row['id'])
+            self.assertEqual(
+                tuple(row.values())[:5], crf_one.subject_visit.natural_key())
+
+    def test_crf_export_to_csv_and_jsonl(self):
+        self.add_visits_and_crfs()
+        file = StringIO()
+        CrfOne.objects.export_to_csv(file)
+        file.seek(0)
+        rows = list(csv.DictReader(file))
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['subject_identifier'], self.subject_identifier)
+        self.assertIn('subject_visit_id', rows[0])
+        file = StringIO()
+        CrfOne.objects.export_to_jsonl(
+            file, queryset=CrfOne.objects.filter(
+                subject_visit__visit_code='1000'))
+        rows = [json.loads(line) for line in file.getvalue().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['visit_code'], '1000')
@@ -0,0 +1,105 @@
+from django.test import TestCase
+from edc_visit_schedule import VisitSchedule, Schedule
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from ..visit_order_registry import VisitOrder, VisitOrderRegistry
+from .visit_schedule import visit_schedule1, visit_schedule2, schedule1
+
+
+class TestVisitOrderRegistry(TestCase):
+
+    def setUp(self):
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.registry = VisitOrderRegistry()
+
+    def test_populate(self):
+        self.registry.populate()
+        self.assertEqual(
+            self.registry.visit_codes('visit_schedule1', 'schedule1'),
+            ['1000', '2000', '3000', '4000'])
+        self.assertEqual(
+            self.registry.visit_codes('visit_schedule2', 'schedule2'),
+            ['5000', '6000', '7000', '8000'])
+
+    def test_get(self):
+        self.assertEqual(
+            self.registry.get('visit_schedule1', 'schedule1', '1000'),
+            VisitOrder(None, '2000', 0))
+        self.assertEqual(
+            self.registry.get('visit_schedule1', 'schedule1', '2000'),
+            VisitOrder('1000', '3000', 1))
+        self.assertEqual(
+            self.registry.get('visit_schedule1', 'schedule1', '4000'),
+            VisitOrder('3000', None, 3))
+        self.assertIsNone(
+            self.registry.get('visit_schedule1', 'schedule1', '9999'))
+
+    def test_matches_schedule(self):
+        schedule = visit_schedule1.schedules.get('schedule1')
+        for visit in schedule.visits.values():
+            previous_visit = schedule.visits.previous(visit.code)
+            self.assertEqual(
+                self.registry.previous_visit_code(
+                    'visit_schedule1', 'schedule1', visit.code),
+                getattr(previous_visit, 'code', None))
+
+    def test_missing_schedule_registered_on_lookup(self):
+        self.assertEqual(self.registry._registry, {})
+        self.assertEqual(
+            self.registry.previous_visit_code('visit_schedule1', 'schedule1', '2000'),
+            '1000')
+        self.assertIn(('visit_schedule1', 'schedule1'), self.registry._registry)
+
+    def test_populate_rebuilds(self):
+        self.registry._registry[('visit_schedule1', 'schedule1')] = (None, {})
+        self.registry._registry[('visit_schedule9', 'schedule9')] = (None, {})
+        self.registry.populate()
+        self.assertNotIn(('visit_schedule9', 'schedule9'), self.registry._registry)
+        self.assertEqual(
+            self.registry.previous_visit_code('visit_schedule1', 'schedule1', '2000'),
+            '1000')
+
+    def schedule_without_visit(self, visit_code):
+        """Returns a copy of schedule1 without the visit.
+        """
+        schedule = Schedule(
+            name='schedule1',
+            onschedule_model='edc_visit_tracking.onscheduleone',
+            offschedule_model='edc_visit_tracking.offscheduleone',
+            consent_model='edc_visit_tracking.subjectconsent',
+            appointment_model='edc_appointment.appointment')
+        for visit in schedule1.visits.values():
+            if visit.code != visit_code:
+                schedule.add_visit(visit)
+        return schedule
+
+    def test_rebuilt_when_site_registry_replaced(self):
+        self.registry.populate()
+        self.assertEqual(
+            self.registry.previous_visit_code('visit_schedule1', 'schedule1', '3000'),
+            '2000')
+        visit_schedule = VisitSchedule(
+            name='visit_schedule1',
+            offstudy_model='edc_visit_tracking.subjectoffstudy',
+            death_report_model='edc_visit_tracking.deathreport')
+        visit_schedule.add_schedule(self.schedule_without_visit('2000'))
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule)
+        self.assertEqual(
+            self.registry.previous_visit_code('visit_schedule1', 'schedule1', '3000'),
+            '1000')
+        self.assertNotIn(('visit_schedule2', 'schedule2'), self.registry._registry)
+
+    def test_registered_again_for_other_schedule(self):
+        self.registry.populate()
+        schedule = self.schedule_without_visit('2000')
+        self.assertEqual(
+            self.registry.previous_visit_code(
+                'visit_schedule1', 'schedule1', '3000', schedule=schedule),
+            '1000')
+        self.assertEqual(
+            self.registry.previous_visit_code(
+                'visit_schedule1', 'schedule1', '3000', schedule=schedule1),
+            '2000')
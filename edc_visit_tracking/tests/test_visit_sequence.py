@@ -1,5 +1,7 @@
 from dateutil.relativedelta import relativedelta
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from edc_appointment.models import Appointment
 from edc_base import get_utcnow
 from edc_facility.import_holidays import import_holidays
@@ -8,6 +10,7 @@ from edc_visit_schedule.site_visit_schedules import site_visit_schedules
 from ..constants import SCHEDULED
 from ..model_mixins import PreviousVisitError
 from ..visit_sequence import VisitSequence, VisitSequenceError
+from ..visit_sequence_cache import visit_sequence_cache
 from .helper import Helper
 from .models import SubjectVisit
 from .visit_schedule import visit_schedule1, visit_schedule2
@@ -85,3 +88,73 @@ class TestPreviousVisit(TestCase):
             appointment=appointments[3],
             report_datetime=get_utcnow() - relativedelta(months=8),
             reason=SCHEDULED)
+
+    def test_previous_visit_resolved_in_one_query(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        SubjectVisit.objects.create(
+            appointment=appointments[0],
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        appointment = appointments[1]
+        with self.assertNumQueries(1):
+            visit_sequence = VisitSequence(appointment=appointment)
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(visit_sequence.previous_visit)
+            visit_sequence.enforce_sequence()
+
+    def test_previous_visit_missing_resolved_in_one_query(self):
+        appointment = Appointment.objects.all().order_by('timepoint_datetime')[1]
+        with self.assertNumQueries(1):
+            visit_sequence = VisitSequence(appointment=appointment)
+        with self.assertNumQueries(0):
+            self.assertIsNone(visit_sequence.previous_visit)
+        self.assertRaises(VisitSequenceError, visit_sequence.enforce_sequence)
+
+    def test_previous_visit_query_uses_visit_columns(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        SubjectVisit.objects.create(
+            appointment=appointments[0],
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        with CaptureQueriesContext(connection) as context:
+            VisitSequence(appointment=appointments[1])
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('JOIN', context.captured_queries[0]['sql'].upper())
+        if connection.vendor == 'sqlite':
+            plan = SubjectVisit.objects.filter(
+                subject_identifier=self.subject_identifier,
+                visit_schedule_name='visit_schedule1',
+                schedule_name='schedule1',
+                visit_code='1000').order_by('-visit_code_sequence').explain()
+            self.assertIn('USING INDEX', plan.upper().replace('COVERING ', ''))
+
+    def test_visit_sequence_cache_shared(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        SubjectVisit.objects.create(
+            appointment=appointments[0],
+            report_datetime=get_utcnow() - relativedelta(months=10),
+            reason=SCHEDULED)
+        appointment = appointments[1]
+        with visit_sequence_cache.enabled():
+            VisitSequence(appointment=appointment)
+            with self.assertNumQueries(0):
+                visit_sequence = VisitSequence(appointment=appointment)
+            self.assertIsNotNone(visit_sequence.previous_visit)
+        self.assertFalse(visit_sequence_cache.active)
+
+    def test_visit_sequence_cache_invalidated_on_save(self):
+        appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        appointment = appointments[1]
+        with visit_sequence_cache.enabled():
+            visit_sequence = VisitSequence(appointment=appointment)
+            self.assertRaises(
+                VisitSequenceError, visit_sequence.enforce_sequence)
+            SubjectVisit.objects.create(
+                appointment=appointments[0],
+                report_datetime=get_utcnow() - relativedelta(months=10),
+                reason=SCHEDULED)
+            visit_sequence = VisitSequence(appointment=appointment)
+            try:
+                visit_sequence.enforce_sequence()
+            except VisitSequenceError as e:
+                self.fail(f'VisitSequenceError unexpectedly raised. Got \'{e}\'')
@@ -0,0 +1,75 @@
+from dateutil.relativedelta import relativedelta
+from django.test import TestCase
+from edc_appointment.models import Appointment
+from edc_base import get_utcnow
+from edc_facility.import_holidays import import_holidays
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from ..constants import SCHEDULED
+from ..visit_sequence import VisitSequence
+from ..visit_timeline import VisitTimeline
+from .helper import Helper
+from .models import SubjectVisit
+from .visit_schedule import visit_schedule1, visit_schedule2
+
+
+class DisabledVisitSequence(VisitSequence):
+    def enforce_sequence(self):
+        return None
+
+
+class TestVisitTimeline(TestCase):
+
+    helper_cls = Helper
+
+    def setUp(self):
+        import_holidays()
+        self.subject_identifier = '12345'
+        self.helper = self.helper_cls(
+            subject_identifier=self.subject_identifier)
+        site_visit_schedules._registry = {}
+        site_visit_schedules.register(visit_schedule=visit_schedule1)
+        site_visit_schedules.register(visit_schedule=visit_schedule2)
+        self.helper.consent_and_put_on_schedule()
+        self.appointments = Appointment.objects.all().order_by('timepoint_datetime')
+        SubjectVisit.visit_sequence_cls = DisabledVisitSequence
+        for index in [0, 1, 3]:
+            SubjectVisit.objects.create(
+                appointment=self.appointments[index],
+                report_datetime=get_utcnow() - relativedelta(months=10 - index),
+                reason=SCHEDULED)
+
+    def tearDown(self):
+        SubjectVisit.visit_sequence_cls = VisitSequence
+
+    def test_loads_in_one_query(self):
+        appointment = self.appointments[0]
+        with self.assertNumQueries(1):
+            visit_timeline = VisitTimeline.from_appointment(appointment)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                [appointment.visit_code for appointment in visit_timeline.appointments],
+                ['1000', '2000', '3000', '4000'])
+            self.assertEqual(
+                [visit.visit_code for visit in visit_timeline.visits],
+                ['1000', '2000', '4000'])
+
+    def test_previous_and_next(self):
+        visit_timeline = VisitTimeline(
+            subject_identifier=self.subject_identifier,
+            visit_schedule_name='visit_schedule1',
+            schedule_name='schedule1')
+        with self.assertNumQueries(0):
+            self.assertIsNone(visit_timeline.previous_visit('1000'))
+            self.assertEqual(visit_timeline.previous_visit('2000').visit_code, '1000')
+            self.assertIsNone(visit_timeline.previous_visit('4000'))
+            self.assertEqual(visit_timeline.next_visit('1000').visit_code, '2000')
+            self.assertIsNone(visit_timeline.next_visit('2000'))
+            self.assertIsNone(visit_timeline.next_visit('4000'))
+            self.assertEqual(visit_timeline.first_visit.visit_code, '1000')
+            self.assertEqual(visit_timeline.last_visit.visit_code, '4000')
+            self.assertEqual(visit_timeline.missing_visit_codes, ['3000'])
+            self.assertIsNone(visit_timeline.previous_visit_code('9999'))
+            self.assertIsNone(visit_timeline.next_visit_code('9999'))
+            self.assertIsNone(visit_timeline.previous_visit('9999'))
+            self.assertIsNone(visit_timeline.next_visit('9999'))
@@ -72,12 +72,12 @@ class VisitTestHelper:
         """Returns a visit instance if it exists."""
         model = django_apps.get_model(*model_label.split('.'))
         visit = model.objects.get(
-            appointment__subject_identifier=subject_identifier, visit_code=visit_code)
+            subject_identifier=subject_identifier, visit_code=visit_code)
         return visit
 
     def get_last_visit(self, model_label=None, subject_identifier=None):
         """Returns the last visit instance if it exists."""
         model = django_apps.get_model(*model_label.split('.'))
         return model.objects.filter(
-            appointment__subject_identifier=subject_identifier).order_by(
-                'report_datetime').last()
+            subject_identifier=subject_identifier).order_by(
+                '-report_datetime').first()
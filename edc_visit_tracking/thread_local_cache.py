@@ -0,0 +1,57 @@
+import threading
+
+from contextlib import contextmanager
+
+
+class ThreadLocalCache:
+
+    """A dictionary cache local to the current thread that does
+    nothing until activated.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def store(self):
+        return getattr(self._local, 'store', None)
+
+    @property
+    def active(self):
+        return self.store is not None
+
+    def activate(self):
+        self._local.store = {}
+
+    def deactivate(self):
+        self._local.store = None
+
+    @contextmanager
+    def enabled(self):
+        """Activates the cache for the duration of the block unless
+        already active.
+        """
+        if self.active:
+            yield self
+        else:
+            self.activate()
+            try:
+                yield self
+            finally:
+                self.deactivate()
+
+    def get(self, key):
+        try:
+            return self.store.get(key)
+        except AttributeError:
+            return None
+
+    def set(self, key, value):
+        if self.active:
+            self.store[key] = value
+
+    def clear(self):
+        """Drops all entries, keeping the cache active.
+        """
+        if self.active:
+            self.store.clear()
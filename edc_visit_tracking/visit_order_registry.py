@@ -0,0 +1,100 @@
+from collections import namedtuple
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+
+VisitOrder = namedtuple('VisitOrder', 'previous_visit_code next_visit_code ordinal')
+
+
+class VisitOrderRegistry:
+
+    """A registry of the order of the visits in each schedule.
+
+    Maps (visit_schedule_name, schedule_name) to the schedule and a
+    dictionary of {visit_code: VisitOrder} where visits are ordered
+    by timepoint.
+
+    Populated in AppConfig.ready() from site_visit_schedules. A
+    schedule missing from the registry is registered on lookup.
+    The registry is rebuilt if the registry of site_visit_schedules
+    is replaced, e.g. in tests, and an entry is registered again if
+    a lookup passes a different schedule of the same name.
+
+    For example:
+
+        visit_order_registry.get('visit_schedule1', 'schedule1', '2000')
+        VisitOrder(previous_visit_code='1000', next_visit_code='3000', ordinal=1)
+    """
+
+    def __init__(self):
+        self._registry = {}
+        self._site_registry = None
+
+    def populate(self):
+        """Rebuilds the registry from site_visit_schedules.
+        """
+        self._registry = {}
+        self._site_registry = site_visit_schedules.registry
+        for visit_schedule in site_visit_schedules.registry.values():
+            for schedule in visit_schedule.schedules.values():
+                self.register(visit_schedule.name, schedule)
+
+    def register(self, visit_schedule_name, schedule):
+        """Registers and returns the visit orders of the schedule.
+        """
+        visit_codes = [
+            visit.code for visit in sorted(
+                schedule.visits.values(), key=lambda visit: visit.timepoint)]
+        visit_orders = {}
+        for ordinal, visit_code in enumerate(visit_codes):
+            visit_orders[visit_code] = VisitOrder(
+                visit_codes[ordinal - 1] if ordinal else None,
+                visit_codes[ordinal + 1] if ordinal + 1 < len(visit_codes) else None,
+                ordinal)
+        self._registry[(visit_schedule_name, schedule.name)] = (
+            schedule, visit_orders)
+        return visit_orders
+
+    def visit_orders(self, visit_schedule_name, schedule_name, schedule=None):
+        """Returns a dictionary of {visit_code: VisitOrder} for the
+        schedule.
+        """
+        if site_visit_schedules.registry is not self._site_registry:
+            self.populate()
+        try:
+            registered_schedule, visit_orders = self._registry[
+                (visit_schedule_name, schedule_name)]
+        except KeyError:
+            pass
+        else:
+            if schedule is None or schedule is registered_schedule:
+                return visit_orders
+        schedule = schedule or site_visit_schedules.get_visit_schedule(
+            visit_schedule_name).schedules.get(schedule_name)
+        return self.register(visit_schedule_name, schedule)
+
+    def visit_codes(self, visit_schedule_name, schedule_name, schedule=None):
+        """Returns the visit codes of the schedule ordered by timepoint.
+        """
+        return list(self.visit_orders(
+            visit_schedule_name, schedule_name, schedule=schedule))
+
+    def get(self, visit_schedule_name, schedule_name, visit_code, schedule=None):
+        """Returns the VisitOrder for the visit code or None.
+        """
+        return self.visit_orders(
+            visit_schedule_name, schedule_name, schedule=schedule).get(visit_code)
+
+    def previous_visit_code(self, visit_schedule_name, schedule_name,
+                            visit_code, schedule=None):
+        visit_order = self.get(
+            visit_schedule_name, schedule_name, visit_code, schedule=schedule)
+        return visit_order.previous_visit_code if visit_order else None
+
+    def next_visit_code(self, visit_schedule_name, schedule_name,
+                        visit_code, schedule=None):
+        visit_order = self.get(
+            visit_schedule_name, schedule_name, visit_code, schedule=schedule)
+        return visit_order.next_visit_code if visit_order else None
+
+
+visit_order_registry = VisitOrderRegistry()
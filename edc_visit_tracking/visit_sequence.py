@@ -1,4 +1,6 @@
-from django.db import transaction
+from .instrumentation import instrumentation, VISIT_SEQUENCE_PREVIOUS_VISIT
+from .visit_order_registry import visit_order_registry
+from .visit_sequence_cache import visit_sequence_cache
 
 
 class VisitSequenceError(Exception):
@@ -9,9 +11,17 @@ class VisitSequence:
 
     """A class that calculates the previous_visit and can enforce
     that the sequence of visits are completed in order.
+
+    The previous visit code is read from `visit_order_registry`.
+    Lookups are shared through `cache` while it is active.
     """
 
+    cache = visit_sequence_cache
+    visit_order_registry = visit_order_registry
+
     def __init__(self, appointment=None):
+        self._previous_visit = None
+        self._previous_visit_resolved = False
         self.appointment = appointment
         self.appointment_model_cls = self.appointment.__class__
         self.model_cls = getattr(
@@ -21,12 +31,19 @@ class VisitSequence:
         self.subject_identifier = self.appointment.subject_identifier
         self.visit_schedule_name = self.appointment.visit_schedule_name
         self.visit_code = self.appointment.visit_code
-        previous_visit = self.appointment.schedule.visits.previous(
-            self.visit_code)
-        try:
-            self.previous_visit_code = previous_visit.code
-        except AttributeError:
-            self.previous_visit_code = None
+        self.cache_key = (
+            self.subject_identifier, self.visit_schedule_name,
+            self.appointment.schedule_name, self.visit_code)
+        cached = self.cache.get(self.cache_key)
+        if cached:
+            self.previous_visit_code, self._previous_visit = cached
+            self._previous_visit_resolved = True
+        else:
+            self.previous_visit_code = self.visit_order_registry.previous_visit_code(
+                self.visit_schedule_name, self.appointment.schedule_name,
+                self.visit_code)
+            self.cache.set(
+                self.cache_key, (self.previous_visit_code, self.previous_visit))
         self.previous_visit_missing = self.previous_visit_code and not self.previous_visit
 
     def enforce_sequence(self):
@@ -41,28 +58,22 @@ class VisitSequence:
     @property
     def previous_visit(self):
         """Returns the previous visit model instance if it exists.
+
+        The visit is selected in one query, without a join, on the
+        schedule fields the visit copies from its appointment,
+        preferring the highest visit_code_sequence. The result
+        (including None) is kept on the instance. No savepoint is
+        opened since `first()` does not raise on a missing visit.
         """
-        previous_visit = None
-        if self.previous_visit_code:
-            with transaction.atomic():
-                try:
-                    previous_visit = self.model_cls.objects.get(
-                        appointment__subject_identifier=self.subject_identifier,
+        if not self._previous_visit_resolved:
+            if self.previous_visit_code:
+                with instrumentation.measure(
+                        VISIT_SEQUENCE_PREVIOUS_VISIT, instance=self.appointment):
+                    self._previous_visit = self.model_cls.objects.filter(
+                        subject_identifier=self.subject_identifier,
                         visit_schedule_name=self.visit_schedule_name,
                         schedule_name=self.appointment.schedule_name,
-                        visit_code=self.previous_visit_code)
-                except self.model_cls.DoesNotExist:
-                    previous_appointment = self.appointment_model_cls.objects.filter(
-                        subject_identifier=self.subject_identifier,
                         visit_code=self.previous_visit_code).order_by(
                             '-visit_code_sequence').first()
-                    if previous_appointment:
-                        try:
-                            previous_visit = self.model_cls.objects.get(
-                                appointment=previous_appointment)
-                        except self.model_cls.DoesNotExist:
-                            previous_visit = None
-
-                    else:
-                        previous_visit = None
-        return previous_visit
+            self._previous_visit_resolved = True
+        return self._previous_visit
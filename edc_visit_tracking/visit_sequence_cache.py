@@ -0,0 +1,30 @@
+from .thread_local_cache import ThreadLocalCache
+
+
+class VisitSequenceCache(ThreadLocalCache):
+
+    """A request-scoped cache of previous visit lookups shared by
+    the VisitSequence instances built while handling one request.
+
+    Entries are keyed on (subject_identifier, visit_schedule_name,
+    schedule_name, visit_code) and hold the tuple
+    (previous_visit_code, previous_visit).
+
+    The cache does nothing until activated, see `enabled` and
+    VisitSequenceCacheMiddleware. Entries for a subject are dropped
+    whenever one of the subject's visits is saved or deleted.
+    """
+
+    def invalidate(self, subject_identifier=None):
+        """Drops entries for the subject or all entries if
+        subject_identifier is None.
+        """
+        if self.store:
+            if subject_identifier is None:
+                self.store.clear()
+            else:
+                for key in [k for k in self.store if k[0] == subject_identifier]:
+                    del self.store[key]
+
+
+visit_sequence_cache = VisitSequenceCache()
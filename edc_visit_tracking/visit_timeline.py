@@ -0,0 +1,131 @@
+from django.apps import apps as django_apps
+from django.core.exceptions import ObjectDoesNotExist
+from edc_visit_schedule.site_visit_schedules import site_visit_schedules
+
+from .visit_order_registry import visit_order_registry
+
+
+class VisitTimeline:
+
+    """An ordered, in-memory view of a subject's appointments and
+    visits for one schedule, loaded with one query.
+
+    Appointments are ordered by the position of their visit code in
+    the schedule and then by visit_code_sequence. Previous and next
+    are answered at the level of the visit code, preferring the visit
+    with the highest visit_code_sequence for the previous code as
+    VisitSequence does.
+
+    For example:
+
+        timeline = VisitTimeline.from_appointment(appointment)
+        timeline.previous_visit(appointment.visit_code)
+    """
+
+    def __init__(self, subject_identifier=None, visit_schedule_name=None,
+                 schedule_name=None, schedule=None):
+        self.subject_identifier = subject_identifier
+        self.visit_schedule_name = visit_schedule_name
+        self.schedule_name = schedule_name
+        self.schedule = schedule or site_visit_schedules.get_visit_schedule(
+            visit_schedule_name).schedules.get(schedule_name)
+        self.visit_codes = visit_order_registry.visit_codes(
+            visit_schedule_name, schedule_name, schedule=self.schedule)
+        self.positions = {
+            visit_code: index for index, visit_code in enumerate(self.visit_codes)}
+        appointment_model_cls = django_apps.get_model(
+            self.schedule.appointment_model)
+        self.visit_model_attr = appointment_model_cls.related_visit_model_attr()
+        appointments = appointment_model_cls.objects.filter(
+            subject_identifier=subject_identifier,
+            visit_schedule_name=visit_schedule_name,
+            schedule_name=schedule_name).select_related(self.visit_model_attr)
+        self.appointments = sorted(
+            appointments, key=lambda appointment: (
+                self.positions.get(appointment.visit_code, len(self.visit_codes)),
+                appointment.visit_code_sequence))
+        self._visits_by_code = {}
+        self.visits = []
+        for appointment in self.appointments:
+            visit = self.get_visit(appointment)
+            if visit:
+                self.visits.append(visit)
+                self._visits_by_code.setdefault(appointment.visit_code, []).append(visit)
+
+    def __repr__(self):
+        return (f'{self.__class__.__name__}(subject_identifier={self.subject_identifier}, '
+                f'visit_schedule_name={self.visit_schedule_name}, '
+                f'schedule_name={self.schedule_name})')
+
+    @classmethod
+    def from_appointment(cls, appointment):
+        return cls(
+            subject_identifier=appointment.subject_identifier,
+            visit_schedule_name=appointment.visit_schedule_name,
+            schedule_name=appointment.schedule_name,
+            schedule=appointment.schedule)
+
+    def get_visit(self, appointment):
+        """Returns the visit for the appointment or None.
+        """
+        try:
+            return getattr(appointment, self.visit_model_attr)
+        except ObjectDoesNotExist:
+            return None
+
+    def get_visits(self, visit_code):
+        """Returns the visits for the visit code ordered by
+        visit_code_sequence.
+        """
+        return self._visits_by_code.get(visit_code, [])
+
+    def previous_visit_code(self, visit_code):
+        """Returns the visit code before visit_code in the schedule
+        or None, also if visit_code is not in the schedule.
+        """
+        position = self.positions.get(visit_code)
+        return self.visit_codes[position - 1] if position else None
+
+    def next_visit_code(self, visit_code):
+        """Returns the visit code after visit_code in the schedule
+        or None, also if visit_code is not in the schedule.
+        """
+        position = self.positions.get(visit_code)
+        if position is None or position + 1 >= len(self.visit_codes):
+            return None
+        return self.visit_codes[position + 1]
+
+    def previous_visit(self, visit_code):
+        """Returns the visit for the visit code before visit_code
+        in the schedule or None.
+        """
+        visits = self.get_visits(self.previous_visit_code(visit_code))
+        return visits[-1] if visits else None
+
+    def next_visit(self, visit_code):
+        """Returns the visit for the visit code after visit_code
+        in the schedule or None.
+        """
+        visits = self.get_visits(self.next_visit_code(visit_code))
+        return visits[0] if visits else None
+
+    @property
+    def first_visit(self):
+        return self.visits[0] if self.visits else None
+
+    @property
+    def last_visit(self):
+        return self.visits[-1] if self.visits else None
+
+    @property
+    def missing_visit_codes(self):
+        """Returns the visit codes without a visit that come
+        before the last visit in the schedule.
+        """
+        if not self.last_visit:
+            return []
+        return [
+            visit_code for visit_code
+            in self.visit_codes[:self.positions.get(
+                self.last_visit.visit_code, len(self.visit_codes))]
+            if not self.get_visits(visit_code)]